@@ -0,0 +1,246 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+BENCH_DIR = Path(".cache") / "benchmarks"
+HISTORY_FILE = BENCH_DIR / "history.json"
+
+# Synthetic dataset sizes (synthetic_data.generate_dataset arguments); 'real' is data/
+SIZES = {
+    'small': dict(n_isolates=4, replicates=3, oct_plates=1, oct_replicates=2),
+    'medium': dict(n_isolates=8, replicates=12, oct_plates=2, oct_replicates=3),
+    'large': dict(n_isolates=16, replicates=50, oct_plates=3, oct_replicates=3, oct_thickness=10),
+}
+
+# --- Stages: setup(data_root) -> state (untimed), run(data_root, state) (timed) ---
+
+def _rheology_groups(data_root):
+    from manifest import build_manifest
+    groups = {}
+    for entry in build_manifest(data_root, kind='rheology'):
+        groups.setdefault((entry.isolate, entry.temperature), []).append(entry.path)
+    return groups
+
+def setup_none(data_root):
+    return None
+
+def setup_entries(data_root):
+    from manifest import build_manifest
+    return build_manifest(data_root, kind='rheology')
+
+def run_ingest(data_root, entries):
+    from rheology_io import RheologyCache, load_rheology
+    cache = RheologyCache(enabled=False)
+    for entry in entries:
+        load_rheology(entry.path, cache=cache)
+
+def run_parameters(data_root, state):
+    from parameter import extract_parameters
+    extract_parameters(data_root, "results")
+
+def run_frequency(data_root, state):
+    from frequency_sweep import analyze_frequency_sweeps
+    analyze_frequency_sweeps(data_root, "results")
+
+def setup_groups(data_root):
+    return _rheology_groups(data_root)
+
+def run_resample(data_root, groups):
+    from resample import averaged_curves
+    averaged_curves(groups)
+
+def run_oct(data_root, state):
+    from roughness_fft_analysis import analyze_oct_directory
+    analyze_oct_directory(str(Path(data_root) / "OCT"), "results")
+
+def setup_params(data_root):
+    from parameter import extract_parameters
+    df_raw, _ = extract_parameters(data_root, "results")
+    return df_raw
+
+def run_stats(data_root, df_raw):
+    from stats import write_statistical_report
+    write_statistical_report(df_raw, "results/statistical_report.txt", output_table="results/statistical_tests.csv")
+
+def run_bootstrap(data_root, df_raw):
+    from bootstrap import bootstrap_parameter_ci
+    bootstrap_parameter_ci(df_raw)
+
+def setup_curves(data_root):
+    from resample import averaged_curves
+    return averaged_curves(_rheology_groups(data_root))
+
+def run_render(data_root, averages):
+    from raw_master import plot_temperature_summary
+    from raw_vis import plot_averaged_data
+    plot_temperature_summary(data_root, "figures/raw", averages=averages)
+    plot_averaged_data(data_root, "figures/raw", averages=averages, force=True)
+
+STAGES = {
+    'ingest': (setup_entries, run_ingest),
+    'parameters': (setup_none, run_parameters),
+    'frequency': (setup_none, run_frequency),
+    'resample': (setup_groups, run_resample),
+    'oct': (setup_none, run_oct),
+    'stats': (setup_params, run_stats),
+    'bootstrap': (setup_params, run_bootstrap),
+    'render': (setup_curves, run_render),
+}
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _measure(stage, data_root, queue):
+    """Child process: run one stage in a scratch working directory (cold caches)"""
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    sys.path.insert(0, str(SCRIPT_DIR))
+    setup, run = STAGES[stage]
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                state = setup(data_root)
+                rss_setup = _peak_rss_mb()
+                start = time.perf_counter()
+                run(data_root, state)
+                wall = time.perf_counter() - start
+            queue.put({'wall': wall, 'peak_rss_mb': _peak_rss_mb(), 'setup_rss_mb': rss_setup})
+        except Exception as e:
+            queue.put({'error': f"{type(e).__name__} - {e}"})
+
+def measure(stage, data_root, repeat=3):
+    """Wall time (min / median over repeats) and peak RSS of one stage, each repeat in a fresh process"""
+    context = multiprocessing.get_context('spawn')
+    samples = []
+    for _ in range(repeat):
+        queue = context.Queue()
+        process = context.Process(target=_measure, args=(stage, str(data_root), queue))
+        process.start()
+        result = queue.get()
+        process.join()
+        if 'error' in result:
+            return result
+        samples.append(result)
+    walls = [s['wall'] for s in samples]
+    return {
+        'wall_min': min(walls),
+        'wall_median': statistics.median(walls),
+        'peak_rss_mb': max(s['peak_rss_mb'] for s in samples),
+        'setup_rss_mb': max(s['setup_rss_mb'] for s in samples),
+    }
+
+def dataset(size, seed=0):
+    """Data root for a size: data/ for 'real', else a cached synthetic tree"""
+    if size == 'real':
+        return Path("data").resolve()
+    from synthetic_data import generate_dataset
+    root = (BENCH_DIR / f"{size}-seed{seed}").resolve()
+    spec = json.dumps({'seed': seed, **SIZES[size]}, sort_keys=True)
+    marker = root / "dataset.json"
+    if not marker.exists() or marker.read_text() != spec:
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_dataset(root, seed=seed, **SIZES[size])
+        marker.write_text(spec)
+    return root
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=SCRIPT_DIR).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_history(history_file=HISTORY_FILE):
+    if Path(history_file).exists():
+        return json.loads(Path(history_file).read_text())
+    return []
+
+def baseline_for(history, stage, size, mode='last'):
+    """Previous result of a stage/size: the latest run, or the fastest ever with mode='best'"""
+    previous = [r for run in history for r in run['results']
+                if r['stage'] == stage and r['size'] == size and 'wall_min' in r]
+    if not previous:
+        return None
+    return min(previous, key=lambda r: r['wall_min']) if mode == 'best' else previous[-1]
+
+def run_benchmarks(stages, sizes, repeat=3, threshold=0.25, rss_threshold=0.25, baseline='last',
+                   history_file=HISTORY_FILE, record=True, seed=0):
+    """Benchmark every stage at every size; returns (results, regressions)"""
+    history = load_history(history_file)
+    results, regressions = [], []
+
+    print(f"{'Stage':<12} {'Size':<8} {'Min (s)':>9} {'Median (s)':>11} {'Peak RSS (MB)':>14} {'vs base':>9}")
+    print("-" * 68)
+    for size in sizes:
+        data_root = dataset(size, seed)
+        for stage in stages:
+            result = {'stage': stage, 'size': size, **measure(stage, data_root, repeat)}
+            results.append(result)
+            if 'error' in result:
+                print(f"{stage:<12} {size:<8} ❌ {result['error']}")
+                continue
+
+            base = baseline_for(history, stage, size, baseline)
+            change = ""
+            if base is not None:
+                ratio = result['wall_min'] / base['wall_min']
+                rss_ratio = result['peak_rss_mb'] / base['peak_rss_mb']
+                change = f"{(ratio - 1) * 100:+.0f}%"
+                if ratio > 1 + threshold:
+                    regressions.append(f"{stage}/{size}: wall {base['wall_min']:.3f}s -> {result['wall_min']:.3f}s")
+                if rss_ratio > 1 + rss_threshold:
+                    regressions.append(f"{stage}/{size}: peak RSS {base['peak_rss_mb']:.0f} -> {result['peak_rss_mb']:.0f} MB")
+            print(f"{stage:<12} {size:<8} {result['wall_min']:>9.3f} {result['wall_median']:>11.3f} "
+                  f"{result['peak_rss_mb']:>14.1f} {change:>9}")
+
+    if record:
+        history.append({
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'machine': platform.platform(),
+            'cpus': os.cpu_count(),
+            'repeat': repeat,
+            'results': results,
+        })
+        Path(history_file).parent.mkdir(parents=True, exist_ok=True)
+        Path(history_file).write_text(json.dumps(history, indent=2))
+    return results, regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage and track regressions")
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES) + ['real'], default=['real', 'small', 'medium'])
+    parser.add_argument('--repeat', type=int, default=3, help="fresh-process runs per stage (min and median kept)")
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed relative slowdown before failing")
+    parser.add_argument('--rss-threshold', type=float, default=0.25, help="allowed relative peak RSS growth")
+    parser.add_argument('--baseline', choices=['last', 'best'], default='last')
+    parser.add_argument('--history', default=str(HISTORY_FILE))
+    parser.add_argument('--no-record', action='store_true', help="compare only, do not append to the history")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    _, regressions = run_benchmarks(args.stages, args.sizes, repeat=args.repeat, threshold=args.threshold,
+                                    rss_threshold=args.rss_threshold, baseline=args.baseline,
+                                    history_file=args.history, record=not args.no_record, seed=args.seed)
+    if regressions:
+        print("\n❌ Regressions beyond threshold:")
+        for line in regressions:
+            print(f"   - {line}")
+        sys.exit(1)
+    print("\n✅ No regressions beyond threshold")
@@ -0,0 +1,146 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from scipy.special import ndtr, ndtri
+from parameter import METRIC_COLUMNS
+
+GROUP_COLUMNS = ['Isolate', 'Temperature']
+
+def pad_groups(df, metrics=METRIC_COLUMNS, group_columns=GROUP_COLUMNS):
+    """Stack replicate values per group into a NaN-free, left-packed array.
+
+    Returns the group keys, values of shape (groups x metrics x n_max) and
+    the per-(group, metric) count of non-NaN replicates; slots past the
+    count are zero.
+    """
+    grouped = df.groupby(group_columns, sort=True)
+    keys = list(grouped.groups)
+    n_max = max(len(idx) for idx in grouped.indices.values())
+
+    values = np.zeros((len(keys), len(metrics), n_max))
+    counts = np.zeros((len(keys), len(metrics)), dtype=int)
+    for g, key in enumerate(keys):
+        block = grouped.get_group(key)[metrics].to_numpy(dtype=float)
+        for m in range(len(metrics)):
+            column = block[:, m][~np.isnan(block[:, m])]
+            values[g, m, :column.size] = column
+            counts[g, m] = column.size
+    return keys, values, counts
+
+def bootstrap_means(values, counts, n_resamples=10000, rng=None):
+    """Bootstrap distribution of the mean for every (group, metric) at once.
+
+    One (B x n_max) matrix of uniform draws is shared by all cells and scaled
+    by each cell's own replicate count, so resample b of a cell with n
+    replicates picks n indices in [0, n). Returns (groups x metrics x B).
+    """
+    rng = np.random.default_rng(rng)
+    n_max = values.shape[-1]
+    uniform = rng.random((n_resamples, n_max))
+    # (groups, metrics, B, n_max) replicate indices; slots j >= n are masked out
+    idx = (uniform[None, None] * counts[..., None, None]).astype(np.intp)
+    used = np.arange(n_max) < counts[..., None, None]
+    resampled = np.take_along_axis(values[:, :, None, :], idx, axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(used, resampled, 0.0).sum(axis=-1) / counts[..., None]
+
+def _quantiles(sorted_boot, q):
+    """Per-cell linear-interpolated quantiles (like np.quantile) of a sorted last axis"""
+    position = np.clip(q, 0.0, 1.0) * (sorted_boot.shape[-1] - 1)
+    lower = np.floor(position).astype(np.intp)
+    upper = np.minimum(lower + 1, sorted_boot.shape[-1] - 1)
+    frac = position - lower
+    lo = np.take_along_axis(sorted_boot, lower[..., None], axis=-1)[..., 0]
+    hi = np.take_along_axis(sorted_boot, upper[..., None], axis=-1)[..., 0]
+    return lo + frac * (hi - lo)
+
+def jackknife_acceleration(values, counts):
+    """BCa acceleration of the mean from leave-one-out means, per cell"""
+    n_max = values.shape[-1]
+    used = np.arange(n_max) < counts[..., None]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        jack = (values.sum(axis=-1, keepdims=True) - values) / (counts[..., None] - 1)
+        jack_mean = np.where(used, jack, 0.0).sum(axis=-1, keepdims=True) / counts[..., None]
+        d = np.where(used, jack_mean - jack, 0.0)
+        return (d ** 3).sum(axis=-1) / (6.0 * ((d ** 2).sum(axis=-1)) ** 1.5)
+
+def confidence_intervals(values, counts, boot, level=0.95, method='bca'):
+    """(low, high) interval of the mean per cell from its bootstrap distribution.
+
+    'percentile' takes the plain quantiles; 'bca' shifts them by the bias
+    correction z0 and jackknife acceleration (Efron 1987). Cells with fewer
+    than two replicates are NaN; cells whose resamples are all identical
+    collapse to the point estimate.
+    """
+    alpha = (1.0 - level) / 2.0
+    sorted_boot = np.sort(boot, axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        theta = values.sum(axis=-1) / counts
+    q_low = np.full(counts.shape, alpha)
+    q_high = np.full(counts.shape, 1.0 - alpha)
+
+    if method == 'bca':
+        # Ties with the estimate count half: with n ~ 3 many resamples are a
+        # permutation of the sample, equal to it up to summation round-off
+        tol = 1e-9 * np.abs(theta)[..., None]
+        below = np.mean(boot < theta[..., None] - tol, axis=-1)
+        at_or_below = np.mean(boot <= theta[..., None] + tol, axis=-1)
+        z0 = ndtri((below + at_or_below) / 2.0)
+        a = jackknife_acceleration(values, counts)
+        z = ndtri(np.array([alpha, 1.0 - alpha]))[:, None, None]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            adjusted = ndtr(z0 + (z0 + z) / (1.0 - a * (z0 + z)))
+        finite = np.isfinite(adjusted).all(axis=0)
+        q_low = np.where(finite, adjusted[0], q_low)
+        q_high = np.where(finite, adjusted[1], q_high)
+    elif method != 'percentile':
+        raise ValueError(f"unknown interval method '{method}'")
+
+    low = _quantiles(sorted_boot, q_low)
+    high = _quantiles(sorted_boot, q_high)
+    degenerate = sorted_boot[..., 0] == sorted_boot[..., -1]
+    low = np.where(degenerate, theta, low)
+    high = np.where(degenerate, theta, high)
+    too_few = counts < 2
+    return np.where(too_few, np.nan, low), np.where(too_few, np.nan, high)
+
+def bootstrap_parameter_ci(df, metrics=METRIC_COLUMNS, n_resamples=10000, level=0.95,
+                           method='bca', seed=0):
+    """Mean and bootstrap CI of each metric per (Isolate, Temperature).
+
+    Returns a table shaped like all_params_avg.csv with <metric>_mean,
+    <metric>_ci_low, <metric>_ci_high and <metric>_n columns.
+    """
+    keys, values, counts = pad_groups(df, metrics)
+    boot = bootstrap_means(values, counts, n_resamples, rng=seed)
+    low, high = confidence_intervals(values, counts, boot, level=level, method=method)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = values.sum(axis=-1) / counts
+
+    table = pd.DataFrame(keys, columns=GROUP_COLUMNS)
+    for m, metric in enumerate(metrics):
+        table[f"{metric}_mean"] = np.where(counts[:, m] > 0, mean[:, m], np.nan)
+        table[f"{metric}_ci_low"] = low[:, m]
+        table[f"{metric}_ci_high"] = high[:, m]
+        table[f"{metric}_n"] = counts[:, m]
+    return table
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bootstrap confidence intervals for the rheological parameters")
+    parser.add_argument('--input', default="results/all_params.csv")
+    parser.add_argument('--output', default="results/all_params_ci.csv")
+    parser.add_argument('--resamples', type=int, default=10000)
+    parser.add_argument('--level', type=float, default=0.95)
+    parser.add_argument('--method', choices=['bca', 'percentile'], default='bca')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    ci = bootstrap_parameter_ci(pd.read_csv(args.input), n_resamples=args.resamples,
+                                level=args.level, method=args.method, seed=args.seed)
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    ci.to_csv(args.output, index=False)
+    print(f"✅ {args.method} intervals ({args.resamples} resamples) written to {args.output} "
+          f"in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,126 @@
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from rheology_io import load_rheology
+from manifest import build_manifest
+from parallel import add_jobs_argument, parallel_map
+from outliers import excluded_identifiers
+from parameter import LABEL_COLUMNS, average_parameters, stack_sweeps
+from instrument import add_profile_arguments, finish_profiling, instrumented, span, start_profiling
+
+# G'(f) = A' f^n', G''(f) = A'' f^n'' fitted in log-log space; prefactors are the moduli at 1 Hz
+FREQ_COLUMNS = ['Freq_exponent_G1', 'Freq_exponent_G2', 'Freq_prefactor_G1', 'Freq_prefactor_G2',
+                'Freq_r2_G1', 'Freq_r2_G2', 'Weak_gel']
+
+# Fewest usable points for a fit, and the weak-gel criterion: G' > G'' at every
+# measured frequency with G' only weakly frequency dependent (n' below this)
+MIN_FIT_POINTS = 3
+WEAK_GEL_MAX_EXPONENT = 0.3
+
+def load_frequency_sweep(entry):
+    """Frequency-sweep segment of one replicate as (frequency, G', G'') arrays sorted by frequency; returns (sweep, error)"""
+    try:
+        with span('parse', entry.identifier):
+            df = load_rheology(entry.path, segment='frequency')
+            df = df.dropna(subset=['freq', 'g1', 'g2']).sort_values(by='freq')
+        return (df['freq'].values, df['g1'].values, df['g2'].values), None
+    except Exception as e:
+        return None, str(e)
+
+def fit_power_laws(freq, modulus, valid):
+    """Least-squares fit of log10 G = log10 A + n log10 f for every row at once.
+
+    Closed form from the per-row sums of the masked log-log points; rows
+    with fewer than MIN_FIT_POINTS usable points are NaN. Returns
+    (exponent n, prefactor A, coefficient of determination R^2).
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = np.log10(np.where(freq > 0, freq, np.nan))
+        y = np.log10(np.where(modulus > 0, modulus, np.nan))
+    valid = valid & np.isfinite(x) & np.isfinite(y)
+    x, y = np.where(valid, x, 0.0), np.where(valid, y, 0.0)
+
+    n = valid.sum(axis=1)
+    sx, sy = x.sum(axis=1), y.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_x, mean_y = sx / n, sy / n
+        sxx = (x * x).sum(axis=1) - sx * mean_x
+        sxy = (x * y).sum(axis=1) - sx * mean_y
+        syy = (y * y).sum(axis=1) - sy * mean_y
+        exponent = sxy / sxx
+        prefactor = 10 ** (mean_y - exponent * mean_x)
+        r2 = np.where(syy > 0, sxy * sxy / (sxx * syy), 1.0)
+
+    too_few = n < MIN_FIT_POINTS
+    for values in (exponent, prefactor, r2):
+        values[too_few] = np.nan
+    return exponent, prefactor, r2
+
+@instrumented('fit')
+def frequency_metrics_batch(freq, g1, g2, lengths=None):
+    """Power-law exponents, prefactors, R^2 and weak-gel flag for every replicate.
+
+    freq, g1, g2 are (replicates x points) arrays padded beyond `lengths`
+    (default: NaN frequency marks padding). Returns a dict of per-replicate
+    arrays keyed by FREQ_COLUMNS.
+    """
+    freq, g1, g2 = (np.atleast_2d(np.asarray(a, dtype=float)) for a in (freq, g1, g2))
+    if lengths is None:
+        valid = ~np.isnan(freq)
+    else:
+        valid = np.arange(freq.shape[1]) < np.asarray(lengths)[:, None]
+
+    n1, a1, r2_1 = fit_power_laws(freq, g1, valid)
+    n2, a2, r2_2 = fit_power_laws(freq, g2, valid)
+    solid = np.where(valid, g1 > g2, True).all(axis=1)
+    weak_gel = solid & (n1 < WEAK_GEL_MAX_EXPONENT)
+    return dict(zip(FREQ_COLUMNS, (n1, n2, a1, a2, r2_1, r2_2, weak_gel)))
+
+def analyze_frequency_sweeps(data_root, output_dir, jobs=1):
+    """Write freq_params.csv / freq_params_avg.csv and return both DataFrames"""
+    data_path = Path(data_root)
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    outliers = excluded_identifiers()
+    with span('manifest'):
+        entries = [e for e in build_manifest(data_path, kind='rheology') if e.identifier not in outliers]
+
+    sweeps, labels = [], []
+    for entry, (sweep, error) in zip(entries, parallel_map(load_frequency_sweep, entries, jobs=jobs)):
+        if error is not None:
+            print(f"Error in {entry.identifier}: {error}")
+            continue
+        sweeps.append(sweep)
+        labels.append({'Isolate': entry.isolate, 'Temperature': entry.temperature})
+
+    # 1. Fit every replicate in one pass
+    df_raw = pd.DataFrame(labels, columns=LABEL_COLUMNS)
+    if sweeps:
+        with span('stack'):
+            stacked = stack_sweeps(sweeps)
+        metrics = frequency_metrics_batch(*stacked)
+        for col in FREQ_COLUMNS:
+            df_raw[col] = metrics[col]
+    df_raw = df_raw.reindex(columns=LABEL_COLUMNS + FREQ_COLUMNS)
+    df_raw.to_csv(output_path / "freq_params.csv", index=False)
+
+    # 2. Mean and standard deviation by sample/temperature (Weak_gel_mean is the weak-gel fraction)
+    with span('aggregate'):
+        df_avg = average_parameters(df_raw, metrics=FREQ_COLUMNS)
+    df_avg.to_csv(output_path / "freq_params_avg.csv", index=False)
+
+    print(f"✅ Frequency-sweep fits complete ({len(df_raw)} sweeps).")
+    print(f"   - Individual results: {output_path}/freq_params.csv")
+    print(f"   - Averaged results: {output_path}/freq_params_avg.csv")
+    return df_raw, df_avg
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit power laws to the frequency sweep of every replicate")
+    add_jobs_argument(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    start_profiling(args)
+    analyze_frequency_sweeps("data", "results", jobs=args.jobs)
+    finish_profiling(args)
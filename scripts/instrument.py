@@ -0,0 +1,143 @@
+import functools
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+# Active Profiler, or None: every hook below is a single check of this global when disabled
+_profiler = None
+_NOOP = nullcontext()
+
+class Profiler:
+    """Counts, cumulative wall time and tracemalloc peaks per stage and per file.
+
+    Spans nest; a stage's time includes its child spans, and its memory peak
+    is the highest traced allocation above the level at which it started.
+    Only the calling process is recorded, so run with -j 1 for per-file
+    detail of work that parallel_map would otherwise hand to workers.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.files = {}
+        self.events = []
+        self._peaks = []
+        self._origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, item=None):
+        start_memory = 0
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._peaks:
+                # Keep the enclosing span's peak before resetting the global one
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            tracemalloc.reset_peak()
+            start_memory = current
+        self._peaks.append(0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            peak = self._peaks.pop()
+            if self.trace_memory:
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+                peak -= start_memory
+            self._record(self.stages, name, elapsed, peak)
+            if item is not None:
+                self._record(self.files, (name, str(item)), elapsed, peak)
+            self.events.append({
+                'name': name, 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+                'ts': (start - self._origin) * 1e6, 'dur': elapsed * 1e6,
+                'args': {} if item is None else {'item': str(item)},
+            })
+
+    @staticmethod
+    def _record(table, key, elapsed, peak):
+        count, total, max_peak = table.get(key, (0, 0.0, 0))
+        table[key] = (count + 1, total + elapsed, max(max_peak, peak))
+
+    def summary(self, top=10):
+        """Per-stage table plus the slowest files, as printable text"""
+        memory = self.trace_memory
+        lines = [f"{'Stage':<14} {'Count':>7} {'Total (s)':>10} {'Mean (ms)':>10}"
+                 + (f" {'Peak (MB)':>10}" if memory else "")]
+        lines.append("-" * len(lines[0]))
+        for name, (count, total, peak) in sorted(self.stages.items(), key=lambda kv: -kv[1][1]):
+            lines.append(f"{name:<14} {count:>7} {total:>10.3f} {1e3 * total / count:>10.2f}"
+                         + (f" {peak / 2**20:>10.2f}" if memory else ""))
+
+        slowest = sorted(self.files.items(), key=lambda kv: -kv[1][1])[:top]
+        if slowest:
+            lines.append("")
+            lines.append(f"Slowest {len(slowest)} file(s):")
+            for (name, item), (count, total, peak) in slowest:
+                lines.append(f"   {total:>8.3f}s  {name:<10} {item}"
+                             + (f"  ({peak / 2**20:.2f} MB)" if memory else ""))
+        return "\n".join(lines)
+
+    def write_trace(self, path):
+        """Chrome trace-event JSON (chrome://tracing, Perfetto)"""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
+
+def enable(trace_memory=False):
+    """Start recording spans in this process; returns the Profiler"""
+    global _profiler
+    _profiler = Profiler(trace_memory=trace_memory)
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return _profiler
+
+def disable():
+    """Stop recording; returns the finished Profiler (None if it was not enabled)"""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is not None and profiler.trace_memory:
+        tracemalloc.stop()
+    return profiler
+
+def span(name, item=None):
+    """Context manager timing one stage (optionally for one file); a no-op when disabled"""
+    if _profiler is None:
+        return _NOOP
+    return _profiler.span(name, item)
+
+def instrumented(name):
+    """Decorator recording every call of a function as a span"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _profiler is None:
+                return func(*args, **kwargs)
+            with _profiler.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def add_profile_arguments(parser):
+    parser.add_argument('--profile', action='store_true',
+                        help="print counts and cumulative time per stage and per file at the end")
+    parser.add_argument('--trace', help="also write a Chrome trace-event JSON to this path")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="record tracemalloc peaks per stage (slows the run down)")
+
+def start_profiling(args):
+    if args.profile or args.trace or args.trace_memory:
+        enable(trace_memory=args.trace_memory)
+
+def finish_profiling(args):
+    profiler = disable()
+    if profiler is None:
+        return
+    print(profiler.summary())
+    if args.trace:
+        profiler.write_trace(args.trace)
+        print(f"✅ Trace written to {args.trace}")
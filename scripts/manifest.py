@@ -0,0 +1,65 @@
+from collections import namedtuple
+from pathlib import Path
+
+# Header keywords that identify each kind of export from its first line alone
+RHEOLOGY_HEADER_KEYS = ['elastic component', 'viscous component', 'complex shear strain']
+OCT_HEADER = ['x', 'y', 'value']
+
+ManifestEntry = namedtuple(
+    'ManifestEntry',
+    ['path', 'kind', 'isolate', 'temperature', 'week', 'plate', 'replicate', 'identifier'],
+)
+
+def sniff_header(path):
+    """Return the lower-cased column names from the first line of a CSV"""
+    with open(path, 'r', encoding='utf-8-sig', errors='replace') as f:
+        first_line = f.readline()
+    return [col.strip().lower() for col in first_line.split(',')]
+
+def classify_file(path):
+    """Classify a CSV as 'rheology', 'oct' or 'unknown' without parsing its body"""
+    header = sniff_header(path)
+    if all(any(key in col for col in header) for key in RHEOLOGY_HEADER_KEYS):
+        return 'rheology'
+    if header[:3] == OCT_HEADER:
+        return 'oct'
+    return 'unknown'
+
+def describe_file(path, kind):
+    """Build a manifest entry from the naming conventions of the data tree.
+
+    Rheology: <temp>/<week>/<isolate>_<temp>_<replicate>.csv
+    OCT:      OCT/<temp>/<week>/<isolate>_plate<N>_<replicate>.csv
+    """
+    path = Path(path)
+    parts = path.stem.split('_')
+    week = path.parent.name
+    identifier = f"{week}/{path.stem}"
+    isolate = parts[0] if len(parts) >= 2 else None
+    replicate = parts[-1] if len(parts) >= 3 else None
+
+    if kind == 'oct':
+        temperature = path.parent.parent.name
+        plate = parts[1] if len(parts) >= 3 else None
+    else:
+        temperature = parts[1] if len(parts) >= 2 else None
+        plate = None
+
+    return ManifestEntry(path, kind, isolate, temperature, week, plate, replicate, identifier)
+
+def build_manifest(data_root, kind=None):
+    """Classify every CSV under data_root, sorted by path.
+
+    Pass kind='rheology' or kind='oct' to keep only that kind of file.
+    Entries whose name does not carry an isolate/temperature are dropped.
+    """
+    entries = []
+    for csv_file in sorted(Path(data_root).rglob("*.csv")):
+        file_kind = classify_file(csv_file)
+        if kind is not None and file_kind != kind:
+            continue
+        entry = describe_file(csv_file, file_kind)
+        if entry.isolate is None or entry.temperature is None:
+            continue
+        entries.append(entry)
+    return entries
@@ -1,38 +1,27 @@
+import argparse
 import os
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 from pathlib import Path
-from scipy.interpolate import interp1d
-
-plt.rcParams.update({
-    'mathtext.fontset': 'cm',
-    'font.size': 28,
-    'axes.titlesize': 32,
-    'axes.labelsize': 28,
-    'xtick.labelsize': 24,
-    'ytick.labelsize': 24,
-    'legend.fontsize': 20,
-    'axes.unicode_minus': False,
-    'axes.linewidth': 2
-})
-# ------------------------------------------------------
-
-def find_column(columns, keywords):
-    for col in columns:
-        if any(key.lower() in col.lower() for key in keywords):
-            return col
-    return None
-
-def process_and_plot_normalised(data_root, output_dir):
+from resample import COMMON_STRAIN, averaged_curves
+from parallel import add_jobs_argument
+from outliers import excluded_identifiers
+from style import CURVE_STYLE, pyplot
+from superposition import REFERENCE, shift_factor_table
+
+def process_and_plot_normalised(data_root, output_dir, jobs=1, averages=None, method='crossover',
+                                reference=REFERENCE, table_path=None):
+    """Normalised master curves per temperature.
+
+    method='crossover' scales each curve by its own G'0 (mean of the first
+    ten grid points) and grid crossover; method='superposition' uses shift
+    factors fitted against one reference curve (superposition.py) and
+    writes them, with their errors, to table_path.
+    """
     data_path = Path(data_root)
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
 
-    outliers = [
-        "week6/2103_50C_1", "week6/2106_50C_1", "week8/2107_50C_1", 
-        "week4/2106_30C_3", "week5/2107_30C_3", "reading_week/2109_30C_1"
-    ]
+    outliers = excluded_identifiers()
 
     temp_summary = {} 
     file_groups = {}
@@ -46,37 +35,28 @@ def process_and_plot_normalised(data_root, output_dir):
             if len(parts) < 2: continue
             file_groups.setdefault((parts[0], parts[1]), []).append(csv_file)
 
-    common_strain = np.logspace(-0.8, 2, 100)
-
-    for (sample_id, temp), files in file_groups.items():
-        all_g1, all_g2 = [], []
-        for file_path in files:
-            identifier = f"{file_path.parent.name}/{file_path.stem}"
-            if identifier in outliers: continue
-            try:
-                df = pd.read_csv(file_path)
-                col_x = find_column(df.columns, ['Complex shear strain(%)'])
-                col_g1 = find_column(df.columns, ['elastic component'])
-                col_g2 = find_column(df.columns, ['viscous component'])
-                col_freq = find_column(df.columns, ['Frequency'])
-
-                if col_freq:
-                    df = df[(df[col_freq] >= 0.9) & (df[col_freq] <= 1.1)]
-                if df.empty: continue
-
-                df = df.sort_values(by=col_x)
-                f1 = interp1d(df[col_x], df[col_g1], bounds_error=False, fill_value="extrapolate")
-                f2 = interp1d(df[col_x], df[col_g2], bounds_error=False, fill_value="extrapolate")
-                all_g1.append(f1(common_strain))
-                all_g2.append(f2(common_strain))
-            except Exception as e:
-                print(f"Error in {identifier}: {type(e).__name__} - {str(e)}")
-
-        if all_g1:
-            if temp not in temp_summary: temp_summary[temp] = {}
-            temp_summary[temp][sample_id] = (np.nanmean(all_g1, axis=0), np.nanmean(all_g2, axis=0))
+    common_strain = COMMON_STRAIN
+    file_groups = {
+        key: [f for f in files if f"{f.parent.name}/{f.stem}" not in outliers]
+        for key, files in file_groups.items()
+    }
+
+    if averages is None:
+        averages = averaged_curves(file_groups, jobs=jobs)
+
+    for (sample_id, temp), (avg_g1, avg_g2) in averages.items():
+        temp_summary.setdefault(temp, {})[sample_id] = (avg_g1, avg_g2)
+
+    shifts = None
+    if method == 'superposition':
+        shifts = shift_factor_table(averages, common_strain, reference=reference)
+        if table_path is not None:
+            shifts.to_csv(table_path, index=False)
+            print(f"Saved: {table_path}")
+        shifts = shifts.set_index(['Isolate', 'Temperature'])
 
     # 2. Normalized plotting logic
+    plt = pyplot(CURVE_STYLE)
     for temp, samples in temp_summary.items():
         plt.figure(figsize=(16, 10))
         cmap = plt.get_cmap('tab10')
@@ -85,13 +65,18 @@ def process_and_plot_normalised(data_root, output_dir):
         for i, (sample_id, (g1, g2)) in enumerate(sorted_samples):
             color = cmap(i % 10)
             
-            # G'0: Plateau modulus
-            g1_0 = np.nanmean(g1[:10]) 
-            
-            # gamma_f: G' = G'' crossover point
-            diff = np.abs(np.log10(g1) - np.log10(g2))
-            cross_idx = np.nanargmin(diff)
-            gamma_f = common_strain[cross_idx]
+            if shifts is not None:
+                # Fitted shift factors in place of G'0 and gamma_f
+                g1_0 = shifts.loc[(sample_id, temp), 'Modulus_shift']
+                gamma_f = shifts.loc[(sample_id, temp), 'Strain_shift']
+            else:
+                # G'0: Plateau modulus
+                g1_0 = np.nanmean(g1[:10]) 
+                
+                # gamma_f: G' = G'' crossover point
+                diff = np.abs(np.log10(g1) - np.log10(g2))
+                cross_idx = np.nanargmin(diff)
+                gamma_f = common_strain[cross_idx]
 
             # Normalization
             g1_norm = g1 / g1_0
@@ -121,4 +106,14 @@ def process_and_plot_normalised(data_root, output_dir):
         plt.close()
 
 if __name__ == "__main__":
-    process_and_plot_normalised("data", "figures/normalised")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Normalised master curves per temperature")
+    add_jobs_argument(parser)
+    parser.add_argument('--method', choices=['crossover', 'superposition'], default='crossover',
+                        help="per-curve G'0/crossover scaling, or least-squares shifts onto a reference curve")
+    parser.add_argument('--reference', default="_".join(REFERENCE),
+                        help="reference curve of the superposition, as ISOLATE_TEMP")
+    parser.add_argument('--table', default="results/shift_factors.csv",
+                        help="where to write the superposition shift factors")
+    args = parser.parse_args()
+    process_and_plot_normalised("data", "figures/normalised", jobs=args.jobs, method=args.method,
+                                reference=tuple(args.reference.split('_')), table_path=args.table)
\ No newline at end of file
@@ -0,0 +1,168 @@
+import warnings
+import numpy as np
+import pandas as pd
+
+# Default Welch segment: this fraction of the profile, but never fewer samples
+# than WELCH_MIN_SEGMENT. The longest resolvable wavelength is one segment, and
+# many colonies have their FFT peak near the full profile length, so short
+# fixed segments (e.g. 1024 px of a 5000 px scan) report much shorter wavelengths
+WELCH_SEGMENT_FRACTION = 0.5
+WELCH_MIN_SEGMENT = 256
+
+def resample_profiles(profiles, n_points=None):
+    """Resample surface profiles onto a common grid and stack them.
+
+    Every (x, y) profile is linearly resampled onto n_points evenly spaced
+    samples spanning its own X range (default: the longest profile's
+    length, so no profile is downsampled). Returns the (colonies x
+    n_points) height array and the per-colony sample spacing.
+    """
+    if n_points is None:
+        n_points = max(len(x) for x, _ in profiles)
+    grid = np.linspace(0.0, 1.0, n_points)
+
+    heights = np.empty((len(profiles), n_points))
+    spacing = np.empty(len(profiles))
+    for i, (x, y) in enumerate(profiles):
+        x = np.asarray(x, dtype=float)
+        span = x[-1] - x[0]
+        heights[i] = np.interp(x[0] + grid * span, x, y)
+        spacing[i] = span / (n_points - 1)
+    return heights, spacing
+
+def detrend_rows(heights):
+    """Remove a least-squares straight line from every row at once"""
+    n = heights.shape[1]
+    t = np.arange(n) - (n - 1) / 2.0
+    mean = heights.mean(axis=1, keepdims=True)
+    slope = (heights - mean) @ t / (t @ t)
+    return heights - mean - slope[:, None] * t
+
+def batch_spectra(profiles, n_points=None):
+    """Detrend, RMS and single-sided rfft amplitude spectra for all profiles in one call.
+
+    Returns a dict with per-colony 'rms', 'wavelength' (1 / frequency of
+    the largest non-DC peak), 'amplitude' (colonies x harmonics) and the
+    matching 'frequency' array (each row scaled by that colony's spacing).
+    """
+    heights, spacing = resample_profiles(profiles, n_points)
+    n = heights.shape[1]
+    detrended = detrend_rows(heights)
+
+    rms = detrended.std(axis=1)
+    amplitude = 2.0 / n * np.abs(np.fft.rfft(detrended, axis=1))
+    frequency = np.arange(amplitude.shape[1])[None, :] / (n * spacing[:, None])
+
+    peak_idx = np.argmax(amplitude[:, 1:], axis=1) + 1
+    peak_freq = frequency[np.arange(len(profiles)), peak_idx]
+    with np.errstate(divide='ignore'):
+        wavelength = np.where(peak_freq > 0, 1.0 / peak_freq, np.nan)
+
+    return {'rms': rms, 'wavelength': wavelength, 'amplitude': amplitude, 'frequency': frequency}
+
+def spectra_on_frequency_axis(spectra, frequency_axis):
+    """Linearly interpolate every colony's amplitude spectrum onto one frequency axis.
+
+    Harmonic k of colony i sits at k * df_i, so the fractional harmonic of
+    each target frequency is f / df_i and the interpolation is a gather of
+    the two neighbouring harmonics; points past a colony's Nyquist are NaN.
+    """
+    amplitude = spectra['amplitude']
+    df = spectra['frequency'][:, 1][:, None]
+    position = np.asarray(frequency_axis)[None, :] / df
+    lower = np.floor(position).astype(int)
+    inside = lower < amplitude.shape[1] - 1
+    lower = np.where(inside, lower, 0)
+    frac = position - lower
+
+    rows = np.arange(amplitude.shape[0])[:, None]
+    resampled = (1 - frac) * amplitude[rows, lower] + frac * amplitude[rows, lower + 1]
+    return np.where(inside, resampled, np.nan)
+
+def group_spectra(spectra, labels, n_freq=1024):
+    """Ensemble-average amplitude spectra per group (e.g. per (Strain, Temp)).
+
+    labels is a DataFrame aligned with the spectra rows. Returns a long
+    DataFrame with the label columns plus Frequency, Amplitude_mean,
+    Amplitude_std and N (colonies contributing at that frequency).
+    """
+    frequency = spectra['frequency']
+    # Common axis: from the lowest frequency every colony resolves to the lowest Nyquist
+    axis = np.linspace(frequency[:, 1].max(), frequency[:, -1].min(), n_freq)
+    resampled = spectra_on_frequency_axis(spectra, axis)
+
+    label_cols = list(labels.columns)
+    tables = []
+    for key, idx in labels.groupby(label_cols).indices.items():
+        block = resampled[idx]
+        count = np.sum(~np.isnan(block), axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.nansum(block, axis=0) / count
+            std = np.sqrt(np.nansum((block - mean) ** 2, axis=0) / (count - 1))
+        table = pd.DataFrame({
+            'Frequency': axis,
+            'Amplitude_mean': mean,
+            'Amplitude_std': np.where(count > 1, std, np.nan),
+            'N': count,
+        })
+        for col, value in zip(label_cols, key if isinstance(key, tuple) else (key,)):
+            table.insert(label_cols.index(col), col, value)
+        tables.append(table)
+    return pd.concat(tables, ignore_index=True)
+
+def interpolate_peak(frequency, power, idx, peak='parabolic'):
+    """Sub-bin peak frequency from the peak bin and its two neighbours.
+
+    'parabolic' fits a parabola to the power values, 'gaussian' fits one to
+    log power (exact for a Gaussian-shaped peak). Edge bins are returned as-is.
+    """
+    if idx <= 0 or idx >= len(power) - 1:
+        return frequency[idx]
+    a, b, c = power[idx - 1:idx + 2]
+    if peak == 'gaussian':
+        if min(a, b, c) <= 0:
+            return frequency[idx]
+        a, b, c = np.log([a, b, c])
+    denom = a - 2 * b + c
+    delta = 0.5 * (a - c) / denom if denom != 0 else 0.0
+    return frequency[idx] + delta * (frequency[idx + 1] - frequency[idx])
+
+def welch_roughness(x, y, nperseg=None, noverlap=None, window='hann', peak='parabolic'):
+    """RMS, dominant wavelength and peak prominence from a Welch PSD estimate.
+
+    The profile is linearly detrended, split into overlapping windowed
+    segments of nperseg samples (default: WELCH_SEGMENT_FRACTION of the
+    profile, at least WELCH_MIN_SEGMENT; always capped at the profile
+    length) and their periodograms averaged. The dominant wavelength comes
+    from the sub-bin interpolated peak; prominence is the scipy peak
+    prominence as a fraction of the peak power (1 = isolated peak, ~0 =
+    flat spectrum). Wavelengths longer than one segment cannot be
+    resolved, so a peak in the lowest non-DC bin is reported with a
+    warning: the true wavelength may be longer than the FFT method finds.
+    """
+    from scipy import signal
+    x = np.asarray(x, dtype=float)
+    y_detrended = signal.detrend(np.asarray(y, dtype=float))
+    rms = np.std(y_detrended)
+
+    spacing = np.mean(np.diff(x))
+    n = len(y_detrended)
+    if nperseg is None:
+        nperseg = max(WELCH_MIN_SEGMENT, int(WELCH_SEGMENT_FRACTION * n))
+    nperseg = min(nperseg, n)
+    frequency, power = signal.welch(y_detrended, fs=1.0 / spacing, window=window,
+                                    nperseg=nperseg, noverlap=noverlap, detrend='linear')
+
+    idx = int(np.argmax(power[1:])) + 1
+    if idx == 1:
+        warnings.warn("Welch peak at the longest resolvable wavelength (one segment); "
+                      "the wavelength is limited by nperseg", RuntimeWarning)
+    peak_freq = interpolate_peak(frequency, power, idx, peak=peak)
+    wavelength = 1.0 / peak_freq if peak_freq > 0 else np.nan
+
+    if 0 < idx < len(power) - 1 and power[idx] > 0:
+        prominence = signal.peak_prominences(power, [idx])[0][0] / power[idx]
+    else:
+        prominence = np.nan
+
+    return {'rms': rms, 'wavelength': wavelength, 'prominence': prominence}
@@ -0,0 +1,147 @@
+import argparse
+import json
+import struct
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from manifest import build_manifest
+
+# Container layout (little-endian):
+#   8 bytes  magic
+#   8 bytes  uint64 length of the JSON index
+#   JSON index, padded to ALIGN bytes
+#   data region: per scan an (n, 2) uint16 X/Y block, then the run-length
+#   encoded Value column as uint8 run values + uint32 run lengths.
+# Offsets in the index are relative to the start of the data region.
+MAGIC = b'OCTPACK1'
+ALIGN = 64
+DEFAULT_PACK = Path(".cache") / "oct.octpack"
+
+def _aligned(n, align=ALIGN):
+    return (n + align - 1) // align * align
+
+def scan_key(csv_file, root):
+    """Key of a scan inside a pack, e.g. '30C/week4/2103_plate1_1'"""
+    return Path(csv_file).relative_to(root).with_suffix('').as_posix()
+
+def run_length_encode(values):
+    """Run values (uint8) and run lengths (uint32); values outside 0-255 are rejected"""
+    values = np.asarray(values)
+    if values.size and (values.min() < 0 or values.max() > np.iinfo(np.uint8).max):
+        raise ValueError("values do not fit in uint8")
+    if values.size == 0:
+        return values.astype(np.uint8), np.zeros(0, dtype=np.uint32)
+    starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+    lengths = np.diff(np.r_[starts, values.size])
+    return values[starts].astype(np.uint8), lengths.astype(np.uint32)
+
+def _read_scan(csv_file, keep_values):
+    columns = ['X', 'Y', 'Value'] if keep_values else ['X', 'Y']
+    df = pd.read_csv(csv_file, usecols=columns, dtype={col: np.int32 for col in columns})
+    xy = df[['X', 'Y']].to_numpy()
+    if xy.size and (xy.min() < 0 or xy.max() > np.iinfo(np.uint16).max):
+        raise ValueError(f"{csv_file}: coordinates do not fit in uint16")
+    if keep_values:
+        values = df['Value'].to_numpy()
+        if values.size and (values.min() < 0 or values.max() > np.iinfo(np.uint8).max):
+            raise ValueError(f"{csv_file}: values do not fit in uint8")
+        run_values, run_lengths = run_length_encode(values)
+    else:
+        run_values, run_lengths = run_length_encode(np.zeros(0))
+    return xy.astype('<u2'), run_values, run_lengths.astype('<u4')
+
+def pack_oct_directory(root_path='data/OCT', output_path=DEFAULT_PACK, keep_values=True):
+    """Convert every OCT CSV under root_path into a single memory-mappable pack.
+
+    keep_values=False drops the Value column entirely (it is 255 for every
+    pixel of the current exports); otherwise it is stored run-length encoded.
+    """
+    root_path = Path(root_path)
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    scans, blocks, offset = [], [], 0
+    for entry in build_manifest(root_path, kind='oct'):
+        xy, run_values, run_lengths = _read_scan(entry.path, keep_values)
+        record = {'key': scan_key(entry.path, root_path), 'n': int(len(xy)), 'runs': int(len(run_values))}
+        for name, block in (('xy', xy), ('values', run_values), ('lengths', run_lengths)):
+            offset = _aligned(offset, 8)
+            record[f'{name}_offset'] = offset
+            blocks.append((offset, block))
+            offset += block.nbytes
+        scans.append(record)
+
+    index = json.dumps({'version': 1, 'scans': scans}).encode()
+    data_start = _aligned(len(MAGIC) + 8 + len(index))
+
+    with open(output_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(index)))
+        f.write(index)
+        for block_offset, block in blocks:
+            f.seek(data_start + block_offset)
+            f.write(block.tobytes())
+        f.truncate(data_start + offset)
+
+    print(f"✅ Packed {len(scans)} OCT scans into {output_path}")
+    return output_path
+
+class OCTPack:
+    """Read-only, memory-mapped view of a pack written by pack_oct_directory"""
+
+    def __init__(self, path=DEFAULT_PACK):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.path} is not an OCT pack")
+            (index_len,) = struct.unpack('<Q', f.read(8))
+            index = json.loads(f.read(index_len))
+        self._data_start = _aligned(len(MAGIC) + 8 + index_len)
+        self._scans = {scan['key']: scan for scan in index['scans']}
+        self._mm = np.memmap(self.path, dtype=np.uint8, mode='r')
+
+    def __len__(self):
+        return len(self._scans)
+
+    def __contains__(self, key):
+        return key in self._scans
+
+    def keys(self):
+        return list(self._scans)
+
+    def _block(self, scan, name, dtype, count):
+        start = self._data_start + scan[f'{name}_offset']
+        return self._mm[start:start + count * np.dtype(dtype).itemsize].view(dtype)
+
+    def xy(self, key):
+        """Zero-copy (n, 2) uint16 view of the X/Y coordinates of one scan"""
+        scan = self._scans[key]
+        return self._block(scan, 'xy', '<u2', 2 * scan['n']).reshape(scan['n'], 2)
+
+    def read_xy(self, key):
+        """X and Y columns of one scan as int32 arrays, like oct_surface.read_oct_xy"""
+        xy = self.xy(key)
+        return xy[:, 0].astype(np.int32), xy[:, 1].astype(np.int32)
+
+    def values(self, key):
+        """Decode the Value column of one scan (None if it was dropped)"""
+        scan = self._scans[key]
+        if scan['runs'] == 0:
+            return None
+        run_values = self._block(scan, 'values', np.uint8, scan['runs'])
+        run_lengths = self._block(scan, 'lengths', '<u4', scan['runs'])
+        return np.repeat(run_values, run_lengths)
+
+@lru_cache(maxsize=None)
+def open_pack(path=DEFAULT_PACK):
+    """Shared OCTPack per path, so worker processes map each pack only once"""
+    return OCTPack(path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack OCT pixel-list CSVs into a memory-mappable container")
+    parser.add_argument('root', nargs='?', default='data/OCT')
+    parser.add_argument('output', nargs='?', default=str(DEFAULT_PACK))
+    parser.add_argument('--drop-values', action='store_true', help="do not store the Value column")
+    args = parser.parse_args()
+    pack_oct_directory(args.root, args.output, keep_values=not args.drop_values)
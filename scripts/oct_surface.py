@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+def read_oct_xy(file_path):
+    """Read the X and Y columns of an OCT pixel list straight into int32 arrays"""
+    df = pd.read_csv(file_path, usecols=['X', 'Y'], dtype={'X': np.int32, 'Y': np.int32})
+    return df['X'].to_numpy(), df['Y'].to_numpy()
+
+def column_minimum(x, y, x0=None, width=None):
+    """Scatter-minimum of y into one bin per X column.
+
+    Returns (x0, surface, present) where surface[i] is the smallest Y in
+    column x0 + i and present[i] is False for columns with no lit pixel.
+    """
+    if x.size == 0:
+        raise ValueError("OCT scan contains no pixels")
+    if x0 is None:
+        x0 = int(x.min())
+    idx = x - x0
+    if width is None:
+        width = int(idx.max()) + 1
+
+    surface = np.full(width, np.iinfo(np.int32).max, dtype=np.int32)
+    np.minimum.at(surface, idx, y)
+    present = np.bincount(idx, minlength=width) > 0
+    return x0, surface, present
+
+def _surface_columns(x0, surface, present, fill_missing):
+    columns = np.arange(x0, x0 + surface.size)
+    if not fill_missing:
+        return columns[present], surface[present].astype(np.int64)
+    if present.all():
+        return columns, surface.astype(np.float64)
+    filled = np.interp(columns, columns[present], surface[present])
+    return columns, filled
+
+def extract_surface(x, y, fill_missing=False):
+    """Top surface of an OCT B-scan: the minimum Y (first lit pixel) per X column.
+
+    By default only X columns containing at least one pixel are returned,
+    matching df.groupby('X')['Y'].min(). With fill_missing=True the full
+    X range is returned and empty columns are linearly interpolated.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.int32)
+    x0, surface, present = column_minimum(x, y)
+    return _surface_columns(x0, surface, present, fill_missing)
+
+def extract_surface_streaming(file_path, chunksize=1_000_000, fill_missing=False):
+    """extract_surface for a pixel list read in fixed-size chunks.
+
+    Each chunk is folded into a running per-column minimum, so peak memory
+    is O(scan width + chunksize) instead of O(lit pixels).
+    """
+    x0, surface, present = None, None, None
+    reader = pd.read_csv(file_path, usecols=['X', 'Y'], dtype={'X': np.int32, 'Y': np.int32},
+                         chunksize=chunksize)
+    for chunk in reader:
+        x = chunk['X'].to_numpy()
+        y = chunk['Y'].to_numpy()
+        if x.size == 0:
+            continue
+        lo, hi = int(x.min()), int(x.max())
+
+        if surface is None:
+            x0, surface, present = column_minimum(x, y, x0=lo, width=hi - lo + 1)
+            continue
+
+        # Grow the running arrays if this chunk reaches new X columns
+        new_x0 = min(x0, lo)
+        new_width = max(x0 + surface.size, hi + 1) - new_x0
+        if new_x0 != x0 or new_width != surface.size:
+            grown = np.full(new_width, np.iinfo(np.int32).max, dtype=np.int32)
+            grown_present = np.zeros(new_width, dtype=bool)
+            grown[x0 - new_x0:x0 - new_x0 + surface.size] = surface
+            grown_present[x0 - new_x0:x0 - new_x0 + surface.size] = present
+            x0, surface, present = new_x0, grown, grown_present
+
+        _, chunk_surface, chunk_present = column_minimum(x, y, x0=x0, width=surface.size)
+        np.minimum(surface, chunk_surface, out=surface)
+        present |= chunk_present
+
+    if surface is None:
+        raise ValueError("OCT scan contains no pixels")
+    return _surface_columns(x0, surface, present, fill_missing)
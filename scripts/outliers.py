@@ -0,0 +1,174 @@
+import argparse
+import hashlib
+import json
+import warnings
+from collections import namedtuple
+from datetime import datetime, timezone
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from manifest import build_manifest
+from parallel import add_jobs_argument, parallel_map
+
+# Versioned exclusion list read by every script that averages or extracts replicates
+EXCLUSIONS_FILE = Path("results") / "exclusions.json"
+FORMAT_VERSION = 1
+
+# Robust z-score cut-off (Iglewicz & Hoaglin) and the smallest spread, in decades of
+# modulus / parameter, a group is assumed to have: with ~3 replicates the MAD alone
+# collapses whenever two curves happen to agree
+THRESHOLD = 3.5
+CURVE_MIN_SCALE = 0.05
+PARAMETER_MIN_SCALE = 0.2
+MIN_REPLICATES = 3
+# Parameters scored in log space; WSO is floored at zero, so its log is unbounded below
+PARAMETER_METRICS = ['G0_prime', 'tan_delta0', 'gamma_f', 'gamma_y']
+
+Exclusion = namedtuple('Exclusion', ['identifier', 'isolate', 'temperature', 'method', 'reason', 'score'])
+
+def outlier_version(identifiers):
+    """Short content hash identifying an outlier list"""
+    return hashlib.sha256("\n".join(sorted(identifiers)).encode()).hexdigest()[:12]
+
+def load_exclusions(path=EXCLUSIONS_FILE):
+    """Exclusions keyed by identifier (week/stem); empty if the file does not exist"""
+    path = Path(path)
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        content = json.load(f)
+    if content.get('format') != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported exclusion file format {content.get('format')}")
+    return {item['identifier']: Exclusion(**item) for item in content['exclusions']}
+
+def excluded_identifiers(path=EXCLUSIONS_FILE):
+    """Set of week/stem identifiers to leave out of extraction and averaging"""
+    return set(load_exclusions(path))
+
+def write_exclusions(exclusions, path=EXCLUSIONS_FILE, detector=None):
+    """Write exclusions sorted by identifier, versioned by the hash of the identifier list"""
+    exclusions = sorted(exclusions, key=lambda e: e.identifier)
+    content = {
+        'format': FORMAT_VERSION,
+        'version': outlier_version([e.identifier for e in exclusions]),
+        'generated': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'detector': detector,
+        'exclusions': [e._asdict() for e in exclusions],
+    }
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(content, f, indent=2)
+        f.write("\n")
+
+def _robust_z(deviation, median_deviation, min_scale):
+    # 1.4826 * MAD estimates the standard deviation of normally distributed replicates
+    return deviation / np.maximum(1.4826 * median_deviation, min_scale)
+
+def curve_scores(log_curves, min_scale=CURVE_MIN_SCALE):
+    """Distance of every replicate curve of one group from the group's median curve.
+
+    log_curves is (replicates x channels x grid) log10 moduli, NaN outside a
+    replicate's measured range. Each point is scaled by the pointwise MAD
+    across replicates; a replicate's score is the median of its scaled
+    deviations. Returns (score, median deviation in decades) per replicate.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        median = np.nanmedian(log_curves, axis=0)
+        deviation = np.abs(log_curves - median)
+        z = _robust_z(deviation, np.nanmedian(deviation, axis=0), min_scale)
+        n = len(log_curves)
+        return np.nanmedian(z.reshape(n, -1), axis=1), np.nanmedian(deviation.reshape(n, -1), axis=1)
+
+def parameter_scores(params, groups, min_scale=PARAMETER_MIN_SCALE):
+    """Signed robust z-score of every log10 parameter within its group (non-positive values are NaN)"""
+    logged = np.log10(params.where(params > 0))
+    median = logged.groupby(groups).transform('median')
+    mad = (logged - median).abs().groupby(groups).transform('median')
+    return (logged - median) / np.maximum(1.4826 * mad, min_scale)
+
+def detect_outliers(entries, jobs=1, threshold=THRESHOLD, curve_min_scale=CURVE_MIN_SCALE,
+                    parameter_min_scale=PARAMETER_MIN_SCALE, min_replicates=MIN_REPLICATES):
+    """Flag replicates whose curve or extracted parameters sit far from their group.
+
+    All replicates of an (isolate, temperature) group are scored together:
+    resampled G'/G'' curves by curve_scores and the extracted parameters by
+    parameter_scores. Groups with fewer than min_replicates usable sweeps
+    are not scored. Returns a list of Exclusions.
+    """
+    from parameter import extract_metrics_batch, load_sweep, stack_sweeps
+    from resample import resample_files
+
+    resampled = resample_files([e.path for e in entries], jobs=jobs)
+    loaded = parallel_map(load_sweep, entries, jobs=jobs)
+    usable = np.array([error is None and resampled['in_range'][i].any()
+                       for i, (_, error) in enumerate(loaded)])
+    entries = [e for e, ok in zip(entries, usable) if ok]
+    idx = np.flatnonzero(usable)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_curves = np.log10(np.stack([resampled['g1'][idx], resampled['g2'][idx]], axis=1))
+    metrics = extract_metrics_batch(*stack_sweeps([loaded[i][0] for i in idx]))
+
+    groups = pd.Series([f"{e.isolate}_{e.temperature}" for e in entries])
+    sizes = groups.map(groups.value_counts()).to_numpy()
+    params = pd.DataFrame({col: metrics[col] for col in PARAMETER_METRICS})
+    param_z = parameter_scores(params, groups, parameter_min_scale)
+
+    curve_z = np.full(len(entries), np.nan)
+    curve_dist = np.full(len(entries), np.nan)
+    for _, rows in groups.groupby(groups).indices.items():
+        curve_z[rows], curve_dist[rows] = curve_scores(log_curves[rows], curve_min_scale)
+
+    exclusions = []
+    for i, entry in enumerate(entries):
+        if sizes[i] < min_replicates:
+            continue
+        methods, reasons, scores = [], [], []
+        if curve_z[i] > threshold:
+            methods.append('curve')
+            reasons.append(f"curve robust z {curve_z[i]:.1f} ({curve_dist[i]:.2f} decades from group median)")
+            scores.append(curve_z[i])
+        flagged = param_z.iloc[i][param_z.iloc[i].abs() > threshold]
+        if len(flagged):
+            methods.append('parameter')
+            reasons.append("parameter robust z " + ", ".join(f"{m} {z:+.1f}" for m, z in flagged.items()))
+            scores.append(flagged.abs().max())
+        if methods:
+            exclusions.append(Exclusion(entry.identifier, entry.isolate, entry.temperature,
+                                        "+".join(methods), "; ".join(reasons), round(float(max(scores)), 2)))
+    return exclusions
+
+def update_exclusions(data_root='data', path=EXCLUSIONS_FILE, jobs=1, dry_run=False, **options):
+    """Re-run detection and rewrite the exclusion file, keeping every manual entry"""
+    manual = [e for e in load_exclusions(path).values() if e.method == 'manual']
+    manual_ids = {e.identifier for e in manual}
+    detected = detect_outliers(build_manifest(data_root, kind='rheology'), jobs=jobs, **options)
+
+    print(f"{'Identifier':<28} {'Method':<16} Reason")
+    for e in sorted(manual + detected, key=lambda e: e.identifier):
+        note = " (also manual)" if e.method != 'manual' and e.identifier in manual_ids else ""
+        print(f"{e.identifier:<28} {e.method:<16} {e.reason}{note}")
+
+    exclusions = manual + [e for e in detected if e.identifier not in manual_ids]
+    if not dry_run:
+        detector = {'threshold': THRESHOLD, 'curve_min_scale': CURVE_MIN_SCALE,
+                    'parameter_min_scale': PARAMETER_MIN_SCALE, 'min_replicates': MIN_REPLICATES, **options}
+        write_exclusions(exclusions, path, detector=detector)
+        print(f"✅ {len(exclusions)} exclusions ({len(manual)} manual) written to {path}")
+    return exclusions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detect outlier replicates and update the exclusion file")
+    add_jobs_argument(parser)
+    parser.add_argument('--output', default=str(EXCLUSIONS_FILE))
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help="robust z-score cut-off")
+    parser.add_argument('--curve-min-scale', type=float, default=CURVE_MIN_SCALE,
+                        help="smallest per-point spread of log-modulus [decades]")
+    parser.add_argument('--parameter-min-scale', type=float, default=PARAMETER_MIN_SCALE,
+                        help="smallest spread of a log parameter [decades]")
+    parser.add_argument('--min-replicates', type=int, default=MIN_REPLICATES)
+    parser.add_argument('--dry-run', action='store_true', help="print the detections without writing the file")
+    args = parser.parse_args()
+    update_exclusions("data", args.output, jobs=args.jobs, dry_run=args.dry_run, threshold=args.threshold,
+                      curve_min_scale=args.curve_min_scale, parameter_min_scale=args.parameter_min_scale,
+                      min_replicates=args.min_replicates)
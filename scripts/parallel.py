@@ -0,0 +1,34 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+def add_jobs_argument(parser):
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=1,
+        help="worker processes for file parsing (1 = serial, 0 = all cores)",
+    )
+
+def resolve_jobs(jobs):
+    if jobs is None:
+        return 1
+    if jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+def parallel_map(func, items, jobs=1, chunksize=None):
+    """Apply func to every item, fanning out to a process pool when jobs > 1.
+
+    Results are always returned in the order of `items`, so callers that
+    pass a sorted file list get output identical to a serial run. func must
+    be a module-level function so it can be pickled.
+    """
+    items = list(items)
+    jobs = resolve_jobs(jobs)
+    if jobs == 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    jobs = min(jobs, len(items))
+    if chunksize is None:
+        # A few chunks per worker balances load without per-item IPC overhead
+        chunksize = max(1, len(items) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(func, items, chunksize=chunksize))
@@ -1,120 +1,243 @@
+import argparse
 import os
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from scipy.interpolate import interp1d
+from rheology_io import file_hash, load_rheology, load_segments
+from manifest import build_manifest
+from parallel import add_jobs_argument, parallel_map
+from outliers import excluded_identifiers, outlier_version
+from instrument import add_profile_arguments, finish_profiling, instrumented, span, start_profiling
 
-def find_column(columns, keywords):
-    for col in columns:
-        if any(key.lower() in col.lower() for key in keywords):
-            return col
-    return None
+METRIC_COLUMNS = ['G0_prime', 'tan_delta0', 'gamma_f', 'gamma_y', 'WSO']
+LABEL_COLUMNS = ['Isolate', 'Temperature']
+
+# Bump whenever extract_metrics_batch changes so --incremental re-extracts every sweep
+EXTRACTOR_VERSION = 2
+# Per-file bookkeeping kept beside all_params.csv for incremental runs
+RECORDS_FILE = "all_params_records.csv"
+RECORD_COLUMNS = ['Source', 'Size', 'MtimeNs', 'Hash', 'ExtractorVersion', 'OutlierVersion']
+
+def stack_sweeps(sweeps):
+    """Pad a list of (strain, g1, g2) arrays into (replicates x points) arrays"""
+    lengths = np.array([len(strain) for strain, _, _ in sweeps], dtype=np.intp)
+    n_points = max(lengths.max(initial=0), 1)
+    padded = np.full((3, len(sweeps), n_points), np.nan)
+    for i, sweep in enumerate(sweeps):
+        for k in range(3):
+            padded[k, i, :lengths[i]] = sweep[k]
+    return padded[0], padded[1], padded[2], lengths
+
+@instrumented('metrics')
+def extract_metrics_batch(strain, g1, g2, lengths=None):
+    """Extract parameters for every replicate at once.
+
+    strain, g1, g2 are (replicates x points) arrays sorted by strain along
+    each row; rows are padded beyond `lengths` (default: NaN strain marks
+    padding). Returns a dict of per-replicate arrays keyed by METRIC_COLUMNS.
+    """
+    strain, g1, g2 = (np.atleast_2d(np.asarray(a, dtype=float)) for a in (strain, g1, g2))
+    n_rep, n_pts = strain.shape
+    rows = np.arange(n_rep)
+    if lengths is None:
+        valid = ~np.isnan(strain)
+    else:
+        valid = np.arange(n_pts) < np.asarray(lengths)[:, None]
 
-def extract_metrics_from_data(strain, g1, g2):
-    """Extract parameters from individual measurement data"""
     # 1. Linear Regime Mask (User-defined: 10^-0.8 ~ 10^0)
-    plateau_mask = (strain >= 10**-0.8) & (strain <= 1.0)
-    
-    # Prepare for cases where plateau data is insufficient
-    if not any(plateau_mask):
-        return [np.nan] * 5
+    in_lve = valid & (strain >= 10**-0.8)
+    plateau_mask = in_lve & (strain <= 1.0)
+    has_plateau = plateau_mask.any(axis=1)
 
-    gp0 = np.nanmean(g1[plateau_mask])
-    gpp0 = np.nanmean(g2[plateau_mask])
-    tan_delta0 = gpp0 / gp0
-    
-    # 2. Yield Strain (gamma_y): The point where G' drops to 95% of G'0
-    gamma_y = np.nan
-    for i in range(len(g1)):
-        # Search starting after the linear region
-        if strain[i] >= 10**-0.8 and g1[i] < 0.95 * gp0:
-            gamma_y = strain[i]
-            break
-            
-    # 3. Crossover Strain (gamma_f): G' = G'' (via interpolation)
-    gamma_f = np.nan
+    def masked_nanmean(values, mask):
+        mask = mask & ~np.isnan(values)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(mask, values, 0).sum(axis=1) / mask.sum(axis=1)
+
+    gp0 = masked_nanmean(g1, plateau_mask)
+    gpp0 = masked_nanmean(g2, plateau_mask)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        tan_delta0 = gpp0 / gp0
+
+    # 2. Yield Strain (gamma_y): first point past 10^-0.8 where G' < 95% of G'0
+    with np.errstate(invalid='ignore'):
+        yield_mask = in_lve & (g1 < 0.95 * gp0[:, None])
+    y_idx = yield_mask.argmax(axis=1)
+    gamma_y = np.where(yield_mask.any(axis=1), strain[rows, y_idx], np.nan)
+
+    # 3. Crossover Strain (gamma_f): first G' > G'' -> G' < G'' step, linear interpolation
     diff = g1 - g2
-    for i in range(len(diff) - 1):
-        if diff[i] > 0 and diff[i+1] < 0:
-            itp = interp1d([diff[i], diff[i+1]], [strain[i], strain[i+1]])
-            gamma_f = float(itp(0))
-            break
-            
-    # 4. Weak Strain Overshoot (WSO): G''_{peak} - G''0
-    post_plateau_mask = (strain > 0.5) 
-    if any(post_plateau_mask):
-        gpp_max = np.nanmax(g2[post_plateau_mask])
+    with np.errstate(invalid='ignore'):
+        cross_mask = valid[:, 1:] & (diff[:, :-1] > 0) & (diff[:, 1:] < 0)
+    c_idx = cross_mask.argmax(axis=1)
+    c_next = np.minimum(c_idx + 1, n_pts - 1)
+    d0, d1 = diff[rows, c_idx], diff[rows, c_next]
+    s0, s1 = strain[rows, c_idx], strain[rows, c_next]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        crossing = s0 + d0 * (s1 - s0) / (d0 - d1)
+    gamma_f = np.where(cross_mask.any(axis=1), crossing, np.nan)
+
+    # 4. Weak Strain Overshoot (WSO): G''_{peak} - G''0, floored at zero
+    post_plateau_mask = valid & (strain > 0.5) & ~np.isnan(g2)
+    gpp_max = np.where(post_plateau_mask, g2, -np.inf).max(axis=1, initial=-np.inf)
+    with np.errstate(invalid='ignore'):
         wso_height = gpp_max - gpp0
-        wso_height = max(0, wso_height)
-    else:
-        wso_height = 0
+        wso_height = np.where(wso_height > 0, wso_height, 0.0)
+
+    metrics = dict(zip(METRIC_COLUMNS, (gp0, tan_delta0, gamma_f, gamma_y, wso_height)))
+    # Prepare for cases where plateau data is insufficient
+    for values in metrics.values():
+        values[~has_plateau] = np.nan
+    return metrics
+
+def extract_metrics_from_data(strain, g1, g2):
+    """Extract parameters from individual measurement data"""
+    metrics = extract_metrics_batch(strain[None, :], g1[None, :], g2[None, :])
+    return tuple(float(metrics[col][0]) for col in METRIC_COLUMNS)
+
+def load_sweep(entry):
+    """Load the amplitude sweep of one replicate as sorted (strain, G', G'') arrays; returns (sweep, error)"""
+    try:
+        with span('parse', entry.identifier):
+            df = load_rheology(entry.path, segment='amplitude')
+            df = df.dropna(subset=['strain', 'g1', 'g2']).sort_values(by='strain')
+        return (df['strain'].values, df['g1'].values, df['g2'].values), None
+    except Exception as e:
+        return None, str(e)
+
+def load_records(records_path):
+    """Per-file records from a previous run, keyed by source path"""
+    if not records_path.exists():
+        return {}
+    records = pd.read_csv(records_path, dtype={col: str for col in RECORD_COLUMNS + LABEL_COLUMNS},
+                          float_precision='round_trip')
+    records['Size'] = records['Size'].astype(np.int64)
+    records['MtimeNs'] = records['MtimeNs'].astype(np.int64)
+    records['ExtractorVersion'] = records['ExtractorVersion'].astype(int)
+    return {row['Source']: row for row in records.to_dict('records')}
+
+def is_current(record, entry, stat, version):
+    """True if a stored record still describes entry's file contents, extractor and outlier list"""
+    if record is None or record['ExtractorVersion'] != EXTRACTOR_VERSION:
+        return False
+    if record['OutlierVersion'] != version:
+        return False
+    if record['Size'] != stat.st_size:
+        return False
+    if record['MtimeNs'] == stat.st_mtime_ns:
+        return True
+    return record['Hash'] == file_hash(entry.path)
+
+def average_parameters(df_raw, metrics=METRIC_COLUMNS):
+    """Mean and standard deviation of every metric per (Isolate, Temperature)"""
+    df_avg = df_raw.groupby(['Isolate', 'Temperature'])[metrics].agg(['mean', 'std']).reset_index()
     
-    return gp0, tan_delta0, gamma_f, gamma_y, wso_height
+    # Clean up column names (e.g., G0_prime_mean, G0_prime_std)
+    df_avg.columns = [f"{c[0]}_{c[1]}" if c[1] else c[0] for c in df_avg.columns]
+    return df_avg
+
+def extract_parameters(data_root, output_dir, jobs=1, incremental=False, store=None):
+    """Write all_params.csv / all_params_avg.csv and return both DataFrames.
 
-def analyze_rheology_by_replicates(data_root, output_dir):
+    Only the amplitude-sweep segment of each export is used. With a
+    ResultsStore, the sweep index (outliers flagged, segment offsets) and
+    the per-sweep parameters are also recorded there as one run.
+    """
     data_path = Path(data_root)
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
 
-    outliers = [
-        "week6/2103_50C_1", "week6/2106_50C_1", "week8/2107_50C_1", 
-        "week4/2106_30C_3", "week5/2107_30C_3", "reading_week/2109_30C_1"
-    ]
-
-    all_individual_results = []
-
-    # Iterate through all individual files
-    for csv_file in data_path.rglob("*.csv"):
-        identifier = f"{csv_file.parent.name}/{csv_file.stem}"
-        if identifier in outliers: continue
-        
-        parts = csv_file.stem.split('_')
-        if len(parts) < 2: continue
-        sample_id, temp = parts[0], parts[1]
-
-        try:
-            df = pd.read_csv(csv_file)
-            col_x = find_column(df.columns, ['Complex shear strain(%)'])
-            col_g1 = find_column(df.columns, ['elastic component'])
-            col_g2 = find_column(df.columns, ['viscous component'])
-            
-            df = df.dropna(subset=[col_x, col_g1, col_g2]).sort_values(by=col_x)
-            
-            # Extract parameters directly from each
-            gp0, tan0, gf, gy, wso = extract_metrics_from_data(
-                df[col_x].values, df[col_g1].values, df[col_g2].values
-            )
-            
-            all_individual_results.append({
-                'Isolate': sample_id,
-                'Temperature': temp,
-                'G0_prime': gp0,
-                'tan_delta0': tan0,
-                'gamma_f': gf,
-                'gamma_y': gy,
-                'WSO': wso
-            })
-        except Exception as e:
-            print(f"Error in {identifier}: {e}")
+    outliers = excluded_identifiers()
+    version = outlier_version(outliers)
+
+    # Iterate through all individual rheology files (OCT scans are skipped by header)
+    with span('manifest'):
+        manifest = build_manifest(data_path, kind='rheology')
+    entries = [e for e in manifest if e.identifier not in outliers]
+
+    # Reuse stored rows for unchanged files; only new or changed sweeps are re-extracted
+    records_path = output_path / RECORDS_FILE
+    previous = load_records(records_path) if incremental else {}
+    records, stale = {}, []
+    for entry in entries:
+        source = entry.path.relative_to(data_path).as_posix()
+        stat = os.stat(entry.path)
+        record = previous.get(source)
+        if is_current(record, entry, stat, version):
+            records[source] = dict(record, Size=stat.st_size, MtimeNs=stat.st_mtime_ns)
+        else:
+            stale.append((source, entry, stat))
+
+    sweeps, fresh = [], []
+    stale_entries = [entry for _, entry, _ in stale]
+    for (source, entry, stat), (sweep, error) in zip(stale, parallel_map(load_sweep, stale_entries, jobs=jobs)):
+        if error is not None:
+            print(f"Error in {entry.identifier}: {error}")
+            continue
+        sweeps.append(sweep)
+        with span('hash', source):
+            digest = file_hash(entry.path)
+        fresh.append({'Source': source, 'Size': stat.st_size, 'MtimeNs': stat.st_mtime_ns,
+                      'Hash': digest, 'ExtractorVersion': EXTRACTOR_VERSION,
+                      'Isolate': entry.isolate, 'Temperature': entry.temperature})
+
+    # Extract parameters for all new/changed replicates in one pass
+    if sweeps:
+        with span('stack'):
+            stacked = stack_sweeps(sweeps)
+        metrics = extract_metrics_batch(*stacked)
+        for i, record in enumerate(fresh):
+            record.update({col: metrics[col][i] for col in METRIC_COLUMNS})
+            records[record['Source']] = record
+    if incremental:
+        print(f"   - Re-extracted {len(sweeps)} of {len(entries)} sweeps")
+
+    ordered = [dict(records[source], OutlierVersion=version)
+               for source in (e.path.relative_to(data_path).as_posix() for e in entries)
+               if source in records]
+    df_records = pd.DataFrame(ordered, columns=RECORD_COLUMNS + LABEL_COLUMNS + METRIC_COLUMNS)
+    df_records.to_csv(records_path, index=False)
 
     # 1. Store all replicate results
-    df_raw = pd.DataFrame(all_individual_results)
+    df_raw = df_records[LABEL_COLUMNS + METRIC_COLUMNS].copy()
     df_raw.to_csv(output_path / "all_params.csv", index=False)
 
     # 2. Calculate the mean and standard deviation by sample/temperature
-    numeric_cols = ['G0_prime', 'tan_delta0', 'gamma_f', 'gamma_y', 'WSO']
-    df_avg = df_raw.groupby(['Isolate', 'Temperature'])[numeric_cols].agg(['mean', 'std']).reset_index()
-    
-    # Clean up column names (e.g., G0_prime_mean, G0_prime_std)
-    df_avg.columns = [f"{c[0]}_{c[1]}" if c[1] else c[0] for c in df_avg.columns]
-
+    with span('aggregate'):
+        df_avg = average_parameters(df_raw)
     df_avg.to_csv(output_path / "all_params_avg.csv", index=False)
+
+    if store is not None:
+        # Segment offsets of every export; unreadable files are logged and left without segments
+        segments = {}
+        for entry in manifest:
+            try:
+                segments[entry.path.relative_to(data_path).as_posix()] = load_segments(entry.path)
+            except Exception as e:
+                print(f"Error in {entry.identifier}: {e}")
+        store.record_parameters(data_path, manifest, outliers, df_records, segments=segments,
+                                incremental=incremental)
     
     print(f"✅ Analysis complete.")
     print(f"   - Individual results: {output_path}/all_params.csv")
     print(f"   - Averaged results: {output_path}/all_params_avg.csv")
     
+    return df_raw, df_avg
+
+def analyze_rheology_by_replicates(data_root, output_dir, jobs=1, incremental=False, store=None):
+    _, df_avg = extract_parameters(data_root, output_dir, jobs=jobs, incremental=incremental, store=store)
     return df_avg
 
 if __name__ == "__main__":
-    analyze_rheology_by_replicates("data", "results")
\ No newline at end of file
+    from results_store import add_store_arguments, open_store
+    parser = argparse.ArgumentParser(description="Extract rheological parameters per replicate")
+    add_jobs_argument(parser)
+    add_profile_arguments(parser)
+    add_store_arguments(parser)
+    parser.add_argument('--incremental', action='store_true',
+                        help="only re-extract sweeps that are new or changed since the last run")
+    args = parser.parse_args()
+    start_profiling(args)
+    analyze_rheology_by_replicates("data", "results", jobs=args.jobs, incremental=args.incremental,
+                                   store=open_store(args))
+    finish_profiling(args)
\ No newline at end of file
@@ -0,0 +1,269 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import lru_cache
+from pathlib import Path
+from manifest import build_manifest
+from rheology_io import file_hash
+from parallel import add_jobs_argument
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+STATE_FILE = Path(".cache") / "pipeline_state.json"
+
+# A pipeline stage. `run(inputs, jobs)` receives the in-memory results of its
+# `deps` by name and returns its own result. `code` lists the scripts whose
+# contents invalidate the stage, `inputs` names a raw-data kind ('rheology' or
+# 'oct') whose file hashes invalidate it, and `outputs` are the files it
+# writes. When a stage is skipped but a dependant runs, `load()` rebuilds its
+# result from those outputs.
+Stage = namedtuple('Stage', ['name', 'run', 'deps', 'code', 'inputs', 'outputs', 'load'])
+
+DATA_ROOT = "data"
+RESULTS = Path("results")
+RESULTS_DB = RESULTS / "results.sqlite"
+EXCLUSIONS_FILE = RESULTS / "exclusions.json"
+FIGURES = Path("figures")
+PARAMETER_FIGURES = ["stiffness_G0.png", "viscoelasticity_tan_delta.png", "toughness_gamma_f.png",
+                     "brittleness_gamma_y.png", "overshoot_WSO.png"]
+
+# Stage bodies import their script lazily: each stage runs in a fresh worker
+# process, and only drawing stages import matplotlib (styles come from style.py).
+
+def run_params(inputs, jobs):
+    from parameter import extract_parameters
+    from results_store import ResultsStore
+    return extract_parameters(DATA_ROOT, RESULTS, jobs=jobs, incremental=True, store=ResultsStore(RESULTS_DB))
+
+def load_params():
+    import pandas as pd
+    dtype = {'Isolate': str, 'Temperature': str}
+    return (pd.read_csv(RESULTS / "all_params.csv", dtype=dtype),
+            pd.read_csv(RESULTS / "all_params_avg.csv", dtype=dtype))
+
+def run_frequency(inputs, jobs):
+    from frequency_sweep import analyze_frequency_sweeps
+    analyze_frequency_sweeps(DATA_ROOT, RESULTS, jobs=jobs)
+
+def run_parameter_bar(inputs, jobs):
+    from parameter_bar import plot_rheology_parameters
+    _, df_avg = inputs['params']
+    plot_rheology_parameters(None, FIGURES / "parameters", df=df_avg, jobs=jobs)
+
+def run_stats(inputs, jobs):
+    from stats import write_statistical_report
+    df_raw, _ = inputs['params']
+    write_statistical_report(df_raw, str(RESULTS / "statistical_report.txt"),
+                             output_table=str(RESULTS / "statistical_tests.csv"))
+
+def run_bootstrap(inputs, jobs):
+    from bootstrap import bootstrap_parameter_ci
+    df_raw, _ = inputs['params']
+    ci = bootstrap_parameter_ci(df_raw)
+    ci.to_csv(RESULTS / "all_params_ci.csv", index=False)
+    return ci
+
+def run_roughness(inputs, jobs):
+    from roughness_fft_analysis import analyze_oct_directory, plot_structure_transition
+    from results_store import ResultsStore
+    _, summary = analyze_oct_directory(f"{DATA_ROOT}/OCT", str(RESULTS), jobs=jobs, store=ResultsStore(RESULTS_DB))
+    plot_structure_transition(summary, str(FIGURES / "roughness"))
+    return summary
+
+def load_roughness():
+    import pandas as pd
+    return pd.read_csv(RESULTS / "oct_fft_summary.csv", dtype={'Strain': str, 'Temp': str})
+
+def run_correlation(inputs, jobs):
+    from stiffness_roughness_correlation import plot_roughness_correlations
+    _, df_avg = inputs['params']
+    plot_roughness_correlations(rms_df=inputs['roughness'], rheo_df=df_avg)
+
+def run_curves(inputs, jobs):
+    from outliers import excluded_identifiers
+    from resample import averaged_curves
+    outliers = excluded_identifiers()
+    file_groups = {}
+    for entry in build_manifest(DATA_ROOT, kind='rheology'):
+        if entry.identifier not in outliers:
+            file_groups.setdefault((entry.isolate, entry.temperature), []).append(entry.path)
+    return averaged_curves(file_groups, jobs=jobs)
+
+def load_curves():
+    return run_curves({}, 1)
+
+def run_raw_master(inputs, jobs):
+    from raw_master import plot_temperature_summary
+    plot_temperature_summary(DATA_ROOT, FIGURES / "raw", averages=inputs['curves'])
+
+def run_normalisation(inputs, jobs):
+    from normalisation import process_and_plot_normalised
+    process_and_plot_normalised(DATA_ROOT, FIGURES / "normalised", averages=inputs['curves'])
+
+def run_raw_vis(inputs, jobs):
+    from raw_vis import plot_averaged_data
+    plot_averaged_data(DATA_ROOT, FIGURES / "raw", jobs=jobs, averages=inputs['curves'])
+
+LOADER_CODE = ["rheology_io.py", "segments.py", "manifest.py", "parallel.py", "outliers.py"]
+
+STAGES = [
+    Stage('params', run_params, (), ["parameter.py", "results_store.py"] + LOADER_CODE, 'rheology',
+          [RESULTS / "all_params.csv", RESULTS / "all_params_avg.csv", RESULTS_DB], load_params),
+    Stage('frequency', run_frequency, (), ["frequency_sweep.py", "parameter.py"] + LOADER_CODE, 'rheology',
+          [RESULTS / "freq_params.csv", RESULTS / "freq_params_avg.csv"], None),
+    Stage('parameter_bar', run_parameter_bar, ('params',), ["parameter_bar.py", "render.py", "style.py"], None,
+          [FIGURES / "parameters" / name for name in PARAMETER_FIGURES], None),
+    Stage('stats', run_stats, ('params',), ["stats.py"], None,
+          [RESULTS / "statistical_report.txt", RESULTS / "statistical_tests.csv"], None),
+    Stage('bootstrap', run_bootstrap, ('params',), ["bootstrap.py"], None,
+          [RESULTS / "all_params_ci.csv"], None),
+    Stage('roughness', run_roughness, (),
+          ["roughness_fft_analysis.py", "oct_surface.py", "oct_store.py", "oct_spectra.py", "manifest.py", "parallel.py",
+           "style.py", "results_store.py"],
+          'oct', [RESULTS / "oct_fft_all.csv", RESULTS / "oct_fft_summary.csv",
+                  FIGURES / "roughness" / "structure_transition_plot.png", RESULTS_DB], load_roughness),
+    Stage('correlation', run_correlation, ('params', 'roughness'), ["stiffness_roughness_correlation.py", "style.py"], None,
+          [FIGURES / "roughness" / "correlation_stiffness_rms.png",
+           FIGURES / "roughness" / "correlation_yield_rms.png"], None),
+    Stage('curves', run_curves, (), ["resample.py"] + LOADER_CODE, 'rheology', [], load_curves),
+    Stage('raw_master', run_raw_master, ('curves',), ["raw_master.py", "style.py"], None,
+          [FIGURES / "raw" / "summary_plot_30C.png", FIGURES / "raw" / "summary_plot_50C.png"], None),
+    Stage('normalisation', run_normalisation, ('curves',), ["normalisation.py", "superposition.py", "style.py"], None,
+          [FIGURES / "normalised" / "normalised_30C.png", FIGURES / "normalised" / "normalised_50C.png"], None),
+    Stage('raw_vis', run_raw_vis, ('curves',), ["raw_vis.py", "render.py", "style.py"], None, [], None),
+]
+STAGES_BY_NAME = {stage.name: stage for stage in STAGES}
+
+def topological_order(stages, targets=None):
+    """Stages needed for targets (default: all), dependencies first"""
+    by_name = {stage.name: stage for stage in stages}
+    order, seen = [], set()
+
+    def visit(name, path=()):
+        if name in path:
+            raise ValueError(f"dependency cycle: {' -> '.join(path + (name,))}")
+        if name in seen:
+            return
+        for dep in by_name[name].deps:
+            visit(dep, path + (name,))
+        seen.add(name)
+        order.append(by_name[name])
+
+    for name in targets or by_name:
+        if name not in by_name:
+            raise KeyError(f"unknown stage '{name}'")
+        visit(name)
+    return order
+
+@lru_cache(maxsize=None)
+def data_fingerprint(kind):
+    """Hash of every raw file of one kind (path + contents), plus the exclusion list for rheology"""
+    h = hashlib.sha256()
+    for entry in build_manifest(DATA_ROOT, kind=kind):
+        h.update(str(entry.path).encode())
+        h.update(file_hash(entry.path).encode())
+    if kind == 'rheology' and EXCLUSIONS_FILE.exists():
+        h.update(file_hash(EXCLUSIONS_FILE).encode())
+    return h.hexdigest()
+
+def stage_fingerprint(stage, dep_fingerprints):
+    """Hash of a stage's code, raw inputs and upstream fingerprints"""
+    h = hashlib.sha256(stage.name.encode())
+    for script in sorted(stage.code):
+        h.update(script.encode())
+        h.update(file_hash(SCRIPT_DIR / script).encode())
+    if stage.inputs:
+        h.update(data_fingerprint(stage.inputs).encode())
+    for dep in stage.deps:
+        h.update(dep_fingerprints[dep].encode())
+    return h.hexdigest()
+
+def load_state(state_file=STATE_FILE):
+    if Path(state_file).exists():
+        return json.loads(Path(state_file).read_text())
+    return {}
+
+def save_state(state, state_file=STATE_FILE):
+    Path(state_file).parent.mkdir(parents=True, exist_ok=True)
+    Path(state_file).write_text(json.dumps(state, indent=2, sort_keys=True))
+
+def run_pipeline(targets=None, jobs=1, stage_jobs=2, force=False, state_file=STATE_FILE):
+    """Run the stage DAG, skipping stages whose code, inputs and outputs are unchanged.
+
+    Independent stages run concurrently in up to stage_jobs fresh worker
+    processes; `jobs` is passed to each stage for its own file-level pool.
+    Results travel between stages in memory. Returns (results, failed
+    stage names); a failed stage only blocks its own dependants.
+    """
+    order = topological_order(STAGES, targets)
+    state = load_state(state_file)
+
+    fingerprints = {}
+    for stage in order:
+        fingerprints[stage.name] = stage_fingerprint(stage, fingerprints)
+    to_run = {
+        stage.name for stage in order
+        if force or state.get(stage.name) != fingerprints[stage.name]
+        or not all(Path(path).exists() for path in stage.outputs)
+    }
+    for stage in order:
+        if stage.name not in to_run:
+            print(f"⏭  {stage.name}: up to date")
+
+    results = {}
+
+    def inputs_for(stage):
+        # Skipped upstream stages are reloaded from their outputs only when needed
+        for dep in stage.deps:
+            if dep not in results:
+                results[dep] = STAGES_BY_NAME[dep].load()
+        return {dep: results[dep] for dep in stage.deps}
+
+    pending = [stage for stage in order if stage.name in to_run]
+    done = {stage.name for stage in order if stage.name not in to_run}
+    running, failed = {}, []
+    # Fresh process per stage (spawn, one task per child) keeps matplotlib state isolated
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max(1, stage_jobs), mp_context=context,
+                             max_tasks_per_child=1) as pool:
+        while pending or running:
+            for stage in [s for s in pending if all(dep in done for dep in s.deps)]:
+                if len(running) >= max(1, stage_jobs):
+                    break
+                pending.remove(stage)
+                print(f"▶  {stage.name}")
+                running[pool.submit(stage.run, inputs_for(stage), jobs)] = stage
+
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                try:
+                    results[stage.name] = future.result()
+                except Exception as e:
+                    # Leave the stage out of date; its dependants cannot run this time
+                    failed.append(stage.name)
+                    print(f"❌ {stage.name}: {type(e).__name__} - {e}")
+                    continue
+                done.add(stage.name)
+                state[stage.name] = fingerprints[stage.name]
+                save_state(state, state_file)
+                print(f"✅ {stage.name}")
+
+    for stage in pending:
+        print(f"⏭  {stage.name}: skipped, an upstream stage failed")
+    return results, failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild results and figures, running only out-of-date stages")
+    parser.add_argument('stages', nargs='*', help=f"target stages (default: all of {', '.join(STAGES_BY_NAME)})")
+    add_jobs_argument(parser)
+    parser.add_argument('--stage-jobs', type=int, default=2, help="independent stages run concurrently")
+    parser.add_argument('--force', action='store_true', help="re-run every selected stage")
+    args = parser.parse_args()
+    _, failed = run_pipeline(args.stages or None, jobs=args.jobs, stage_jobs=args.stage_jobs, force=args.force)
+    if failed:
+        raise SystemExit(f"Failed stages: {', '.join(failed)}")
@@ -1,38 +1,17 @@
+import argparse
 import os
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
 from pathlib import Path
-from scipy.interpolate import interp1d
+from resample import COMMON_STRAIN, averaged_curves
+from parallel import add_jobs_argument
+from outliers import excluded_identifiers
+from style import CURVE_STYLE, pyplot
 
-plt.rcParams.update({
-    'mathtext.fontset': 'cm',
-    'font.size': 28,
-    'axes.titlesize': 32,
-    'axes.labelsize': 28,
-    'xtick.labelsize': 24,
-    'ytick.labelsize': 24,
-    'legend.fontsize': 20,
-    'axes.unicode_minus': False,
-    'axes.linewidth': 2
-})
-# --------------------------------------------------
-
-def find_column(columns, keywords):
-    for col in columns:
-        if any(key.lower() in col.lower() for key in keywords):
-            return col
-    return None
-
-def plot_temperature_summary(data_root, output_dir):
+def plot_temperature_summary(data_root, output_dir, jobs=1, averages=None):
     data_path = Path(data_root)
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
 
-    outliers = [
-        "week6/2103_50C_1", "week6/2106_50C_1", "week8/2107_50C_1", 
-        "week4/2106_30C_3", "week5/2107_30C_3", "reading_week/2109_30C_1"
-    ]
+    outliers = excluded_identifiers()
 
     temp_summary = {} 
     file_groups = {}
@@ -47,40 +26,19 @@ def plot_temperature_summary(data_root, output_dir):
             if len(parts) < 2: continue
             file_groups.setdefault((parts[0], parts[1]), []).append(csv_file)
 
-    common_strain = np.logspace(-0.8, 2, 100)
-
-    for (sample_id, temp), files in file_groups.items():
-        all_g1, all_g2 = [], []
-        for file_path in files:
-            identifier = f"{file_path.parent.name}/{file_path.stem}"
-            if identifier in outliers: continue
-            try:
-                df = pd.read_csv(file_path)
-                col_x = find_column(df.columns, ['Complex shear strain(%)'])
-                col_g1 = find_column(df.columns, ['elastic component'])
-                col_g2 = find_column(df.columns, ['viscous component'])
-                col_freq = find_column(df.columns, ['Frequency'])
-
-                if col_freq:
-                    df = df[(df[col_freq] >= 0.9) & (df[col_freq] <= 1.1)]
-                if df.empty: continue
+    common_strain = COMMON_STRAIN
+    file_groups = {
+        key: [f for f in files if f"{f.parent.name}/{f.stem}" not in outliers]
+        for key, files in file_groups.items()
+    }
 
-                df = df.sort_values(by=col_x)
-                f1 = interp1d(df[col_x], df[col_g1], bounds_error=False, fill_value="extrapolate")
-                f2 = interp1d(df[col_x], df[col_g2], bounds_error=False, fill_value="extrapolate")
-                
-                all_g1.append(f1(common_strain))
-                all_g2.append(f2(common_strain))
-            except Exception as e:
-                print(f"Error in {identifier}: {type(e).__name__} - {str(e)}")
+    if averages is None:
+        averages = averaged_curves(file_groups, jobs=jobs)
 
-        if all_g1:
-            avg_g1 = np.nanmean(all_g1, axis=0)
-            avg_g2 = np.nanmean(all_g2, axis=0)
-            if temp not in temp_summary:
-                temp_summary[temp] = {}
-            temp_summary[temp][sample_id] = (avg_g1, avg_g2)
+    for (sample_id, temp), (avg_g1, avg_g2) in averages.items():
+        temp_summary.setdefault(temp, {})[sample_id] = (avg_g1, avg_g2)
 
+    plt = pyplot(CURVE_STYLE)
     for temp, samples in temp_summary.items():
         plt.figure(figsize=(16, 10)) 
         colors = plt.get_cmap('tab10')
@@ -108,4 +66,7 @@ def plot_temperature_summary(data_root, output_dir):
         plt.close()
 
 if __name__ == "__main__":
-    plot_temperature_summary("data", "figures/raw")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Summary strain-sweep plots per temperature")
+    add_jobs_argument(parser)
+    args = parser.parse_args()
+    plot_temperature_summary("data", "figures/raw", jobs=args.jobs)
\ No newline at end of file
@@ -0,0 +1,104 @@
+import hashlib
+import inspect
+import json
+import os
+from collections import namedtuple
+from importlib.metadata import version
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from parallel import parallel_map
+from instrument import span
+from style import pyplot
+
+MANIFEST_NAME = ".render_manifest.json"
+
+# One figure to draw: draw(*args, output) saves a single file at `output`.
+# `style` is a dict of rcParams applied only while it renders.
+FigureTask = namedtuple('FigureTask', ['output', 'draw', 'args', 'style'])
+
+def _update(h, value):
+    if isinstance(value, pd.DataFrame):
+        h.update(repr(list(value.columns)).encode())
+        h.update(pd.util.hash_pandas_object(value, index=False).values.tobytes())
+    elif isinstance(value, np.ndarray):
+        h.update(repr((value.dtype.str, value.shape)).encode())
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        h.update(f"{type(value).__name__}{len(value)}".encode())
+        for item in value:
+            _update(h, item)
+    elif isinstance(value, dict):
+        _update(h, sorted(value.items(), key=lambda item: str(item[0])))
+    else:
+        h.update(repr(value).encode())
+
+def figure_fingerprint(task):
+    """Hash of a figure's input data, style settings and drawing code"""
+    h = hashlib.sha256()
+    _update(h, task.args)
+    _update(h, task.style or {})
+    h.update(inspect.getsource(task.draw).encode())
+    h.update(version('matplotlib').encode())
+    return h.hexdigest()
+
+def load_manifest(output_dir):
+    manifest = Path(output_dir) / MANIFEST_NAME
+    if manifest.exists():
+        return json.loads(manifest.read_text())
+    return {}
+
+def save_manifest(output_dir, entries):
+    manifest = Path(output_dir) / MANIFEST_NAME
+    tmp = manifest.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(entries, indent=2, sort_keys=True))
+    os.replace(tmp, manifest)
+
+def _render(task):
+    # matplotlib is only loaded once a figure is actually drawn
+    import matplotlib
+    matplotlib.use('Agg')
+    plt = pyplot()
+    try:
+        with span('savefig', task.output.name), plt.rc_context(task.style or {}):
+            task.draw(*task.args, task.output)
+        return None
+    except Exception as e:
+        return f"{type(e).__name__} - {str(e)}"
+    finally:
+        plt.close('all')
+
+def render_figures(tasks, output_dir, jobs=1, force=False):
+    """Draw every out-of-date figure, in a process pool when jobs > 1.
+
+    A figure is skipped when its fingerprint matches the manifest in
+    output_dir and the file still exists. Returns the list of outputs drawn;
+    raises RuntimeError naming the failed outputs once the whole batch has
+    run if any figure could not be drawn.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(output_dir)
+
+    fingerprints = {task.output.name: figure_fingerprint(task) for task in tasks}
+    todo = [
+        task for task in tasks
+        if force or manifest.get(task.output.name) != fingerprints[task.output.name]
+        or not task.output.exists()
+    ]
+
+    drawn, failed = [], []
+    for task, error in zip(todo, parallel_map(_render, todo, jobs=jobs)):
+        if error is not None:
+            print(f"Error drawing {task.output.name}: {error}")
+            manifest.pop(task.output.name, None)
+            failed.append(task.output.name)
+        else:
+            manifest[task.output.name] = fingerprints[task.output.name]
+            drawn.append(task.output)
+    save_manifest(output_dir, manifest)
+
+    if failed:
+        raise RuntimeError(f"{len(failed)} figure(s) failed to render: {', '.join(failed)}")
+    print(f"✅ Rendered {len(drawn)} figure(s), {len(tasks) - len(todo)} unchanged")
+    return drawn
@@ -0,0 +1,172 @@
+import hashlib
+import os
+import numpy as np
+from pathlib import Path
+from rheology_io import file_hash, load_rheology
+from parallel import parallel_map
+from instrument import instrumented
+
+# Common strain axis shared by every averaged / master-curve plot
+COMMON_STRAIN = np.logspace(-0.8, 2, 100)
+
+# Bump when the resampling scheme changes so cached arrays are recomputed
+RESAMPLE_VERSION = 2
+CACHE_DIR = Path(".cache") / "resampled"
+
+def load_amplitude_sweep(file_path):
+    """Amplitude-sweep segment of one replicate as sorted (strain, G', G'') arrays; returns (sweep, error)"""
+    try:
+        df = load_rheology(file_path, segment='amplitude')
+        df = df.dropna(subset=['strain', 'g1', 'g2']).sort_values(by='strain')
+        return (df['strain'].values, df['g1'].values, df['g2'].values), None
+    except Exception as e:
+        return None, f"{type(e).__name__} - {str(e)}"
+
+def _log_positive(values):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(values > 0, np.log10(values), np.nan)
+
+@instrumented('interpolate')
+def resample_sweeps(sweeps, grid=COMMON_STRAIN):
+    """Interpolate every sweep onto grid in log-strain / log-modulus space at once.
+
+    All replicates are concatenated into one monotonic abscissa by shifting
+    replicate r by r * offset in log-strain, so a single np.interp call
+    serves the whole batch. Grid points outside a replicate's measured
+    strain range are NaN (never extrapolated) and reported in `in_range`.
+    Returns (g1, g2, in_range), each of shape (replicates x grid).
+    """
+    log_grid = np.log10(grid)
+    n_rep, n_grid = len(sweeps), len(grid)
+    g1_out = np.full((n_rep, n_grid), np.nan)
+    g2_out = np.full((n_rep, n_grid), np.nan)
+    in_range = np.zeros((n_rep, n_grid), dtype=bool)
+
+    xs, y1s, y2s, rows = [], [], [], []
+    for r, (strain, g1, g2) in enumerate(sweeps):
+        log_x, log_g1, log_g2 = _log_positive(strain), _log_positive(g1), _log_positive(g2)
+        keep = ~(np.isnan(log_x) | np.isnan(log_g1) | np.isnan(log_g2))
+        if keep.sum() < 2:
+            continue
+        xs.append(log_x[keep])
+        y1s.append(log_g1[keep])
+        y2s.append(log_g2[keep])
+        rows.append(r)
+        in_range[r] = (log_grid >= log_x[keep][0]) & (log_grid <= log_x[keep][-1])
+    if not rows:
+        return g1_out, g2_out, in_range
+
+    lo = min(x[0] for x in xs + [log_grid])
+    hi = max(x[-1] for x in xs + [log_grid])
+    offset = (hi - lo) + 1.0
+    shifts = np.arange(len(rows)) * offset
+
+    xp = np.concatenate([x + s for x, s in zip(xs, shifts)])
+    query = (log_grid[None, :] + shifts[:, None]).ravel()
+    rows = np.array(rows)
+    g1_out[rows] = 10 ** np.interp(query, xp, np.concatenate(y1s)).reshape(len(rows), n_grid)
+    g2_out[rows] = 10 ** np.interp(query, xp, np.concatenate(y2s)).reshape(len(rows), n_grid)
+
+    g1_out[~in_range] = np.nan
+    g2_out[~in_range] = np.nan
+    return g1_out, g2_out, in_range
+
+class ResampleCache:
+    """.npz cache of resampled (G', G'', in_range) rows keyed by file hash and grid"""
+
+    def __init__(self, cache_dir=CACHE_DIR, enabled=True):
+        self.cache_dir = Path(cache_dir)
+        self.enabled = enabled
+
+    def key(self, file_path, grid):
+        grid_hash = hashlib.sha1(np.ascontiguousarray(grid, dtype=np.float64).tobytes()).hexdigest()[:12]
+        return f"{file_hash(file_path)[:24]}_{grid_hash}_v{RESAMPLE_VERSION}"
+
+    def get(self, key):
+        entry = self.cache_dir / f"{key}.npz"
+        if not self.enabled or not entry.exists():
+            return None
+        try:
+            with np.load(entry, allow_pickle=False) as npz:
+                return npz['g1'], npz['g2'], npz['in_range']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key, g1, g2, in_range):
+        if not self.enabled:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entry = self.cache_dir / f"{key}.npz"
+        tmp = entry.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, 'wb') as f:
+            np.savez(f, g1=g1, g2=g2, in_range=in_range)
+        os.replace(tmp, entry)
+
+_default_cache = ResampleCache()
+
+def resample_files(file_paths, grid=COMMON_STRAIN, jobs=1, cache=None):
+    """Resampled (G', G'', in_range) arrays for every file, rows aligned with file_paths.
+
+    Cached rows are reused; the remaining files are loaded (in a process
+    pool when jobs > 1) and resampled in one batch. Returns a dict with the
+    three (files x grid) arrays plus 'errors', a per-file message or None.
+    Rows of files that failed to load, or have no amplitude sweep, are all-NaN.
+    """
+    cache = cache or _default_cache
+    n_files, n_grid = len(file_paths), len(grid)
+    g1 = np.full((n_files, n_grid), np.nan)
+    g2 = np.full((n_files, n_grid), np.nan)
+    in_range = np.zeros((n_files, n_grid), dtype=bool)
+    errors = [None] * n_files
+
+    keys = [cache.key(path, grid) for path in file_paths]
+    missing = []
+    for i, key in enumerate(keys):
+        cached = cache.get(key)
+        if cached is None:
+            missing.append(i)
+        else:
+            g1[i], g2[i], in_range[i] = cached
+
+    loaded = parallel_map(load_amplitude_sweep, [file_paths[i] for i in missing], jobs=jobs)
+    batch, batch_rows = [], []
+    for i, (sweep, error) in zip(missing, loaded):
+        if error is not None:
+            errors[i] = error
+        else:
+            batch.append(sweep)
+            batch_rows.append(i)
+
+    if batch:
+        b1, b2, b_in = resample_sweeps(batch, grid)
+        for j, i in enumerate(batch_rows):
+            g1[i], g2[i], in_range[i] = b1[j], b2[j], b_in[j]
+            cache.put(keys[i], b1[j], b2[j], b_in[j])
+
+    return {'g1': g1, 'g2': g2, 'in_range': in_range, 'errors': errors}
+
+def averaged_curves(file_groups, grid=COMMON_STRAIN, jobs=1):
+    """Replicate-averaged G', G'' per group from {group: [file paths]}.
+
+    Averages ignore grid points outside a replicate's measured range; a
+    point covered by no replicate stays NaN. Groups without any usable
+    replicate are omitted. Per-file load errors are printed.
+    """
+    tasks = [(key, path) for key, files in sorted(file_groups.items()) for path in sorted(files)]
+    resampled = resample_files([path for _, path in tasks], grid=grid, jobs=jobs)
+
+    rows = {}
+    for i, ((key, path), error) in enumerate(zip(tasks, resampled['errors'])):
+        if error is not None:
+            print(f"Error in {Path(path).parent.name}/{Path(path).stem}: {error}")
+        elif resampled['in_range'][i].any():
+            rows.setdefault(key, []).append(i)
+
+    averages = {}
+    for key, idx in rows.items():
+        count = resampled['in_range'][idx].sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            avg_g1 = np.nansum(resampled['g1'][idx], axis=0) / count
+            avg_g2 = np.nansum(resampled['g2'][idx], axis=0) / count
+        averages[key] = (avg_g1, avg_g2)
+    return averages
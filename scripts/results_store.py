@@ -0,0 +1,294 @@
+import argparse
+import json
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+import pandas as pd
+from parameter import METRIC_COLUMNS, average_parameters
+from roughness_fft_analysis import summarise_roughness
+
+DEFAULT_DB = Path("results") / "results.sqlite"
+# Bump when the tables change; an older file is rebuilt on open (it only holds derived results)
+SCHEMA_VERSION = 2
+OCT_METRICS = ['RMS', 'Wavelength', 'Prominence']
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    stage TEXT NOT NULL,
+    started TEXT NOT NULL,
+    data_root TEXT NOT NULL,
+    options TEXT
+);
+CREATE TABLE IF NOT EXISTS sweeps (
+    source TEXT PRIMARY KEY,
+    isolate TEXT NOT NULL,
+    temperature TEXT NOT NULL,
+    week TEXT,
+    replicate TEXT,
+    excluded INTEGER NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    hash TEXT,
+    run_id INTEGER NOT NULL REFERENCES runs(run_id)
+);
+CREATE INDEX IF NOT EXISTS sweeps_group ON sweeps(isolate, temperature);
+CREATE INDEX IF NOT EXISTS sweeps_week ON sweeps(week);
+CREATE TABLE IF NOT EXISTS segments (
+    source TEXT NOT NULL REFERENCES sweeps(source),
+    segment INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    stop INTEGER NOT NULL,
+    PRIMARY KEY (source, segment)
+);
+CREATE INDEX IF NOT EXISTS segments_kind ON segments(kind);
+CREATE TABLE IF NOT EXISTS parameters (
+    source TEXT PRIMARY KEY REFERENCES sweeps(source),
+    {", ".join(f"{metric} REAL" for metric in METRIC_COLUMNS)}
+);
+CREATE TABLE IF NOT EXISTS oct_colonies (
+    source TEXT PRIMARY KEY,
+    isolate TEXT NOT NULL,
+    temperature TEXT NOT NULL,
+    week TEXT,
+    plate TEXT,
+    replicate TEXT,
+    {", ".join(f"{metric.lower()} REAL" for metric in OCT_METRICS)},
+    run_id INTEGER NOT NULL REFERENCES runs(run_id)
+);
+CREATE INDEX IF NOT EXISTS oct_group ON oct_colonies(isolate, temperature);
+CREATE INDEX IF NOT EXISTS oct_week ON oct_colonies(week);
+"""
+
+# Query keywords, matched against the label columns of sweeps / oct_colonies
+FILTERS = ['isolate', 'temperature', 'week', 'replicate', 'plate']
+
+def _where(alias, filters):
+    """SQL WHERE clause and parameters; each filter is one value or a list of values"""
+    clauses, params = [], []
+    for name, value in filters.items():
+        if name not in FILTERS:
+            raise TypeError(f"unknown filter '{name}'")
+        if value is None:
+            continue
+        values = [value] if isinstance(value, str) else [str(v) for v in value]
+        clauses.append(f"{alias}.{name} IN ({', '.join('?' * len(values))})")
+        params.extend(values)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+def _rows(frame, columns):
+    """Plain Python rows for executemany (NaN is stored as NULL)"""
+    return frame[columns].astype(object).where(frame[columns].notna(), None).to_numpy().tolist()
+
+class ResultsStore:
+    """Embedded SQLite store of per-sweep parameters and per-colony OCT metrics.
+
+    Sweeps and colonies keep the week and replicate parsed from their path
+    and are indexed by (isolate, temperature) and by week, so a filtered
+    query is an index lookup. Each producer run replaces its own tables
+    and is logged in `runs`. Queries return DataFrames shaped like the
+    CSVs in results/, plus Week/Replicate columns.
+    """
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path, timeout=30)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._create()
+
+    def _create(self):
+        # Pipeline stages open the store from concurrent processes: take the write
+        # lock first and re-check the version, so only one of them (re)builds it.
+        # executescript would commit early, hence one statement at a time.
+        self.connection.execute("PRAGMA foreign_keys = OFF")
+        try:
+            with self.connection:
+                self.connection.execute("BEGIN IMMEDIATE")
+                if self.connection.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+                    return
+                tables = [row[0] for row in self.connection.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table'")]
+                for table in tables:
+                    self.connection.execute(f"DROP TABLE {table}")
+                for statement in SCHEMA.split(';'):
+                    if statement.strip():
+                        self.connection.execute(statement)
+                self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        finally:
+            self.connection.execute("PRAGMA foreign_keys = ON")
+
+    def close(self):
+        self.connection.close()
+
+    def _start_run(self, stage, data_root, options):
+        cursor = self.connection.execute(
+            "INSERT INTO runs (stage, started, data_root, options) VALUES (?, ?, ?, ?)",
+            (stage, datetime.now(timezone.utc).isoformat(timespec='seconds'),
+             Path(data_root).as_posix(), json.dumps(options, sort_keys=True)))
+        return cursor.lastrowid
+
+    def record_parameters(self, data_root, entries, outliers, records, segments=None, **options):
+        """Replace the sweep index and per-sweep parameters with one extraction run.
+
+        entries is the full rheology manifest (outliers are kept, flagged as
+        excluded); records is the per-file table built by extract_parameters;
+        segments maps a source path to its list of Segment(kind, start, stop).
+        """
+        data_root = Path(data_root)
+        stamps = records.set_index('Source')[['Size', 'MtimeNs', 'Hash']].to_dict('index')
+        with self.connection:
+            run_id = self._start_run('params', data_root, options)
+            self.connection.execute("DELETE FROM parameters")
+            self.connection.execute("DELETE FROM segments")
+            self.connection.execute("DELETE FROM sweeps")
+            sweeps = []
+            for entry in entries:
+                source = entry.path.relative_to(data_root).as_posix()
+                stamp = stamps.get(source, {})
+                sweeps.append((source, entry.isolate, entry.temperature, entry.week, entry.replicate,
+                               int(entry.identifier in outliers), stamp.get('Size'),
+                               stamp.get('MtimeNs'), stamp.get('Hash'), run_id))
+            self.connection.executemany(
+                "INSERT INTO sweeps VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [tuple(v.item() if hasattr(v, 'item') else v for v in row) for row in sweeps])
+            self.connection.executemany(
+                f"INSERT INTO parameters VALUES ({', '.join('?' * (1 + len(METRIC_COLUMNS)))})",
+                _rows(records, ['Source'] + METRIC_COLUMNS))
+            self.connection.executemany(
+                "INSERT INTO segments VALUES (?, ?, ?, ?, ?)",
+                [(source, i, *segment) for source, items in (segments or {}).items()
+                 for i, segment in enumerate(items)])
+        return run_id
+
+    def record_colonies(self, root_path, entries, metrics, **options):
+        """Replace the OCT colony table; metrics is aligned with entries (RMS, Wavelength[, Prominence])"""
+        root_path = Path(root_path)
+        metrics = metrics.reindex(columns=OCT_METRICS)
+        with self.connection:
+            run_id = self._start_run('roughness', root_path, options)
+            self.connection.execute("DELETE FROM oct_colonies")
+            labels = [(entry.path.relative_to(root_path).as_posix(), entry.isolate, entry.temperature,
+                       entry.week, entry.plate, entry.replicate) for entry in entries]
+            self.connection.executemany(
+                "INSERT INTO oct_colonies VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(*label, *values, run_id) for label, values in zip(labels, _rows(metrics, OCT_METRICS))])
+        return run_id
+
+    def _query(self, sql, params=()):
+        return pd.read_sql_query(sql, self.connection, params=params)
+
+    def parameters(self, **filters):
+        """Per-sweep parameters of the non-excluded sweeps (all_params.csv columns plus Week, Replicate, Source)"""
+        where, params = _where('s', filters)
+        where += (" AND " if where else " WHERE ") + "s.excluded = 0"
+        metrics = ", ".join(f"p.{metric}" for metric in METRIC_COLUMNS)
+        return self._query(
+            f"SELECT s.isolate AS Isolate, s.temperature AS Temperature, {metrics}, "
+            f"s.week AS Week, s.replicate AS Replicate, s.source AS Source "
+            f"FROM sweeps s JOIN parameters p ON p.source = s.source{where} ORDER BY s.source", params)
+
+    def parameter_summary(self, **filters):
+        """Mean/std per (Isolate, Temperature), as in all_params_avg.csv"""
+        return average_parameters(self.parameters(**filters))
+
+    def segments(self, kind=None, **filters):
+        """Row offsets (start:stop) of every segment of every indexed sweep, optionally of one kind"""
+        where, params = _where('s', filters)
+        if kind is not None:
+            where += (" AND " if where else " WHERE ") + "g.kind = ?"
+            params.append(kind)
+        return self._query(
+            f"SELECT s.isolate AS Isolate, s.temperature AS Temperature, s.week AS Week, "
+            f"s.replicate AS Replicate, g.segment AS Segment, g.kind AS Kind, g.start AS Start, "
+            f"g.stop AS Stop, s.source AS Source "
+            f"FROM sweeps s JOIN segments g ON g.source = s.source{where} "
+            f"ORDER BY s.source, g.segment", params)
+
+    def colonies(self, **filters):
+        """Per-colony OCT metrics (oct_fft_all.csv columns plus Plate, Replicate, Source)"""
+        where, params = _where('o', filters)
+        return self._query(
+            f"SELECT o.isolate AS Strain, o.temperature AS Temp, o.week AS Week, "
+            f"o.rms AS RMS, o.wavelength AS Wavelength, o.prominence AS Prominence, "
+            f"o.plate AS Plate, o.replicate AS Replicate, o.source AS Source "
+            f"FROM oct_colonies o{where} ORDER BY o.source", params)
+
+    def roughness_summary(self, **filters):
+        """Mean/std per (Strain, Temp), as in oct_fft_summary.csv"""
+        return summarise_roughness(self.colonies(**filters))
+
+    def correlation_table(self, **filters):
+        """Group means of the rheological and OCT metrics side by side, joined in SQL"""
+        sweep_where, sweep_params = _where('s', {k: v for k, v in filters.items() if k != 'plate'})
+        oct_where, oct_params = _where('o', filters)
+        sweep_where += (" AND " if sweep_where else " WHERE ") + "s.excluded = 0"
+        metrics = ", ".join(f"AVG(p.{metric}) AS {metric}_mean" for metric in METRIC_COLUMNS)
+        return self._query(
+            f"WITH rheo AS (SELECT s.isolate, s.temperature, {metrics} "
+            f"FROM sweeps s JOIN parameters p ON p.source = s.source{sweep_where} "
+            f"GROUP BY s.isolate, s.temperature), "
+            f"oct AS (SELECT o.isolate, o.temperature, AVG(o.rms) AS RMS_mean, "
+            f"AVG(o.wavelength) AS Wavelength_mean "
+            f"FROM oct_colonies o{oct_where} GROUP BY o.isolate, o.temperature) "
+            f"SELECT oct.isolate AS Strain, oct.temperature AS Temp, oct.RMS_mean, oct.Wavelength_mean, "
+            f"{', '.join(f'rheo.{metric}_mean' for metric in METRIC_COLUMNS)} "
+            f"FROM oct JOIN rheo ON rheo.isolate = oct.isolate AND rheo.temperature = oct.temperature "
+            f"ORDER BY Strain, Temp", sweep_params + oct_params)
+
+    def runs(self):
+        return self._query("SELECT * FROM runs ORDER BY run_id")
+
+def add_store_arguments(parser):
+    parser.add_argument('--db', default=str(DEFAULT_DB), help="results store to record this run in")
+    parser.add_argument('--no-db', action='store_true', help="do not record results in the store")
+
+def open_store(args):
+    return None if args.no_db else ResultsStore(args.db)
+
+def add_filter_arguments(parser):
+    parser.add_argument('--isolate', nargs='+')
+    parser.add_argument('--temperature', nargs='+')
+    parser.add_argument('--week', nargs='+')
+    parser.add_argument('--replicate', nargs='+')
+
+def selected_filters(args):
+    return {name: getattr(args, name) for name in FILTERS if getattr(args, name, None)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the results store")
+    parser.add_argument('table', choices=['parameters', 'parameter-summary', 'segments', 'colonies',
+                                          'roughness-summary', 'correlation', 'runs'])
+    parser.add_argument('--db', default=str(DEFAULT_DB))
+    add_filter_arguments(parser)
+    parser.add_argument('--plate', nargs='+')
+    parser.add_argument('--output', help="write the table to this CSV instead of printing it")
+    args = parser.parse_args()
+
+    if not Path(args.db).exists():
+        print(f"Error: {args.db} not found. Run parameter.py / roughness_fft_analysis.py first.")
+        exit(1)
+    store = ResultsStore(args.db)
+    filters = selected_filters(args)
+    if args.table == 'parameters':
+        table = store.parameters(**filters)
+    elif args.table == 'parameter-summary':
+        table = store.parameter_summary(**filters)
+    elif args.table == 'segments':
+        table = store.segments(**filters)
+    elif args.table == 'colonies':
+        table = store.colonies(**filters)
+    elif args.table == 'roughness-summary':
+        table = store.roughness_summary(**filters)
+    elif args.table == 'correlation':
+        table = store.correlation_table(**filters)
+    else:
+        table = store.runs()
+
+    if args.output:
+        table.to_csv(args.output, index=False)
+        print(f"✅ {len(table)} rows written to {args.output}")
+    else:
+        print(table.to_string(index=False))
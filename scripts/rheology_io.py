@@ -0,0 +1,136 @@
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from instrument import span
+from segments import segment_slice, segment_table, segments_from_table
+
+# Canonical column name -> keywords used to locate it in a rheometer export
+RHEOLOGY_COLUMNS = {
+    'strain': ['Complex shear strain(%)'],
+    'g1': ['elastic component'],
+    'g2': ['viscous component'],
+    'freq': ['Frequency'],
+    'gap': ['Gap'],
+    'normal_force': ['Normal force'],
+}
+REQUIRED_COLUMNS = ['strain', 'g1', 'g2']
+
+# Bump when the parsed layout changes so stale cache entries are re-parsed
+CACHE_VERSION = 2
+CACHE_DIR = Path(".cache") / "rheology"
+
+def find_column(columns, keywords):
+    for col in columns:
+        if any(key.lower() in col.lower() for key in keywords):
+            return col
+    return None
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def parse_rheology_csv(csv_file):
+    """Parse one rheometer export into typed float64 arrays keyed by canonical name.
+
+    The (kind, start, stop) segment table of the export is stored under
+    'segments' (see segments.segment_table).
+    """
+    with span('read_csv'):
+        df = pd.read_csv(csv_file, encoding='utf-8-sig')
+    arrays = {}
+    with span('columns'):
+        for name, keywords in RHEOLOGY_COLUMNS.items():
+            col = find_column(df.columns, keywords)
+            if col is not None:
+                arrays[name] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)
+
+    missing = [name for name in REQUIRED_COLUMNS if name not in arrays]
+    if missing:
+        raise KeyError(f"missing rheology columns {missing}")
+    with span('segment'):
+        arrays['segments'] = segment_table(arrays.get('freq'), arrays['strain'])
+    return arrays
+
+class RheologyCache:
+    """Columnar .npz cache of parsed rheometer exports.
+
+    Entries are keyed by the resolved source path and invalidated when the
+    file size or mtime changes; a changed mtime with identical contents
+    (e.g. after a fresh checkout) is detected by hash and re-stamped.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, enabled=True):
+        self.cache_dir = Path(cache_dir)
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    def entry_path(self, csv_file):
+        key = hashlib.sha1(str(Path(csv_file).resolve()).encode()).hexdigest()
+        return self.cache_dir / f"{key}.npz"
+
+    def _read_entry(self, entry):
+        try:
+            with np.load(entry, allow_pickle=False) as npz:
+                return {k: npz[k] for k in npz.files}
+        except (OSError, ValueError):
+            return None
+
+    def _write_entry(self, entry, arrays, stat, digest):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        meta = np.array([CACHE_VERSION, stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+        tmp = entry.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, 'wb') as f:
+            np.savez(f, _meta=meta, _hash=np.array(digest), **arrays)
+        os.replace(tmp, entry)
+
+    def load(self, csv_file):
+        """Return the parsed arrays for csv_file, parsing only if the cache is stale"""
+        if not self.enabled:
+            return parse_rheology_csv(csv_file)
+
+        stat = os.stat(csv_file)
+        entry = self.entry_path(csv_file)
+        cached = self._read_entry(entry) if entry.exists() else None
+
+        if cached is not None:
+            version, size, mtime_ns = (int(v) for v in cached.pop('_meta'))
+            digest = str(cached.pop('_hash'))
+            if version == CACHE_VERSION and size == stat.st_size:
+                if mtime_ns == stat.st_mtime_ns:
+                    self.hits += 1
+                    return cached
+                if digest == file_hash(csv_file):
+                    self._write_entry(entry, cached, stat, digest)
+                    self.hits += 1
+                    return cached
+
+        self.misses += 1
+        arrays = parse_rheology_csv(csv_file)
+        self._write_entry(entry, arrays, stat, file_hash(csv_file))
+        return arrays
+
+_default_cache = RheologyCache()
+
+def load_rheology(csv_file, cache=None, segment=None):
+    """Load one rheometer export as a DataFrame with canonical column names.
+
+    segment='frequency', 'amplitude' or 'hold' keeps only the rows of the
+    first segment of that kind (no rows if the export has none).
+    """
+    arrays = (cache or _default_cache).load(csv_file)
+    df = pd.DataFrame({name: arrays[name] for name in RHEOLOGY_COLUMNS if name in arrays})
+    if segment is not None:
+        rows = segment_slice(arrays['segments'], segment)
+        df = df.iloc[rows] if rows is not None else df.iloc[:0]
+    return df
+
+def load_segments(csv_file, cache=None):
+    """Segments of one rheometer export as a list of Segment(kind, start, stop)"""
+    return segments_from_table((cache or _default_cache).load(csv_file)['segments'])
@@ -1,113 +1,218 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.fft import fft, fftfreq
-from scipy import signal
-import glob
+import argparse
 import os
-from matplotlib.lines import Line2D
-
-plt.rcParams.update({
-    'mathtext.fontset': 'cm',
-    'font.size': 28,
-    'axes.titlesize': 32,
-    'axes.labelsize': 28,
-    'xtick.labelsize': 24,
-    'ytick.labelsize': 24,
-    'legend.fontsize': 20,
-    'axes.unicode_minus': False,
-    'axes.linewidth': 2,
-    'figure.dpi': 150
-})
-
-def analyze_oct_file(file_path):
+from functools import partial
+from pathlib import Path
+from manifest import build_manifest, describe_file
+from oct_surface import extract_surface, extract_surface_streaming, read_oct_xy
+from oct_store import open_pack
+from oct_spectra import batch_spectra, group_spectra, welch_roughness
+from parallel import add_jobs_argument, parallel_map
+from instrument import add_profile_arguments, finish_profiling, instrumented, span, start_profiling
+from style import ROUGHNESS_STYLE, pyplot
+
+@instrumented('fft')
+def surface_roughness(x, y):
+    """RMS roughness and dominant FFT wavelength of one surface profile"""
+    from scipy import signal
+    from scipy.fft import fft, fftfreq
+    y_detrended = signal.detrend(y)
+    
+    # RMS
+    rms = np.std(y_detrended)
+    
+    # FFT
+    N = len(x)
+    T = np.mean(np.diff(x))
+    yf = fft(y_detrended)
+    xf = fftfreq(N, T)[:N//2]
+    amplitude = 2.0/N * np.abs(yf[:N//2])
+    
+    peak_idx = np.argmax(amplitude[1:]) + 1
+    peak_freq = xf[peak_idx]
+    wavelength = 1/peak_freq if peak_freq > 0 else np.nan
+    
+    return rms, wavelength
+
+def read_profile(source, chunksize=None):
+    """Top-surface profile (x, y) of one scan: a CSV path or a (pack_path, key) pair"""
+    # Surface extraction: first lit pixel (minimum Y) in each X column
+    if isinstance(source, tuple):
+        pack_path, key = source
+        with span('parse', key):
+            xy = open_pack(pack_path).read_xy(key)
+    elif chunksize:
+        # Streaming mode: memory bounded by scan width, not by pixel count
+        with span('surface', source):
+            return extract_surface_streaming(source, chunksize=chunksize)
+    else:
+        with span('parse', source):
+            xy = read_oct_xy(source)
+    with span('surface'):
+        return extract_surface(*xy)
+
+def analyze_oct_file(file_path, chunksize=None):
     try:
-        df = pd.read_csv(file_path)
-        # Surface extraction
-        surface = df.groupby('X')['Y'].min().reset_index()
-        
-        x = surface['X'].values
-        y = surface['Y'].values
-        
-        y_detrended = signal.detrend(y)
-        
-        # RMS
-        rms = np.std(y_detrended)
-        
-        # FFT
-        N = len(x)
-        T = np.mean(np.diff(x))
-        yf = fft(y_detrended)
-        xf = fftfreq(N, T)[:N//2]
-        amplitude = 2.0/N * np.abs(yf[:N//2])
-        
-        peak_idx = np.argmax(amplitude[1:]) + 1
-        peak_freq = xf[peak_idx]
-        wavelength = 1/peak_freq if peak_freq > 0 else np.nan
-        
-        return rms, wavelength
+        x, y = read_profile(file_path, chunksize=chunksize)
+        return surface_roughness(x, y)
     except Exception as e:
         print(f"Error in {file_path}: {e}")
         return None, None
 
-root_path = 'data/OCT'
-results = []
-files = glob.glob(os.path.join(root_path, '**', '*.csv'), recursive=True)
+def analyze_oct_file_welch(file_path, chunksize=None, **welch_options):
+    """Welch-PSD variant of analyze_oct_file; returns a dict of metrics or None"""
+    try:
+        x, y = read_profile(file_path, chunksize=chunksize)
+        with span('fft'):
+            return welch_roughness(x, y, **welch_options)
+    except Exception as e:
+        print(f"Error in {file_path}: {e}")
+        return None
+
+def load_oct_profile(file_path, chunksize=None):
+    """Surface profile for the batch engine; None if the scan cannot be read"""
+    try:
+        return read_profile(file_path, chunksize=chunksize)
+    except Exception as e:
+        print(f"Error in {file_path}: {e}")
+        return None
+
+def summarise_roughness(res_df):
+    """Mean and standard deviation of RMS and wavelength per (Strain, Temp)"""
+    summary = res_df.groupby(['Strain', 'Temp']).agg({
+        'RMS': ['mean', 'std'],
+        'Wavelength': ['mean', 'std']
+    }).reset_index()
 
-for f in files:
-    path_parts = f.split(os.sep)
-    temp = path_parts[-3] 
-    filename = path_parts[-1]
-    strain = filename.split('_')[0]
-    
-    rms, wavelength = analyze_oct_file(f)
-    if rms is not None:
-        results.append({'Strain': strain, 'Temp': temp, 'RMS': rms, 'Wavelength': wavelength})
-
-res_df = pd.DataFrame(results)
-summary = res_df.groupby(['Strain', 'Temp']).agg({
-    'RMS': ['mean', 'std'],
-    'Wavelength': ['mean', 'std']
-}).reset_index()
-
-summary.columns = ['Strain', 'Temp', 'RMS_mean', 'RMS_std', 'Wavelength_mean', 'Wavelength_std']
-os.makedirs('results', exist_ok=True)
-summary.to_csv('results/oct_fft_summary.csv', index=False)
-
-# --- Transition Plot ---
-plt.figure(figsize=(14, 10))
-color_cycle = plt.rcParams['axes.prop_cycle'].by_key()['color']
-
-for i, strain in enumerate(sorted(summary['Strain'].unique())):
-    subset = summary[summary['Strain'] == strain].sort_values('Temp')
-    color = color_cycle[i % len(color_cycle)]
-    if len(subset) >= 2:
-        x = subset['Wavelength_mean'].values
-        y = subset['RMS_mean'].values
-        x_err = subset['Wavelength_std'].values
-        y_err = subset['RMS_std'].values
-        
-        # 30C: Circle (o), 50C: Triangle (^)
-        plt.scatter(x[0], y[0], marker='o', s=250, color=color, edgecolors='black', zorder=5, label=strain)
-        plt.scatter(x[1], y[1], marker='^', s=300, color=color, edgecolors='black', zorder=5)
-        plt.errorbar(x[0], y[0], xerr=x_err[0], yerr=y_err[0],
-                     fmt='none', color=color, capsize=5, linewidth=1.5, zorder=4)
-        plt.errorbar(x[1], y[1], xerr=x_err[1], yerr=y_err[1],
-                     fmt='none', color=color, capsize=5, linewidth=1.5, zorder=4)
-
-plt.xlabel(r'Wavelength $\lambda$ [$\mu$m]', labelpad=15)
-plt.ylabel(r'RMS Roughness [$\mu$m]', labelpad=15)
-
-handles, labels = plt.gca().get_legend_handles_labels()
-temp_elements = [
-    Line2D([0], [0], marker='o', color='gray', label='30$^{\circ}$C', markersize=12, ls='None', markeredgecolor='k'),
-    Line2D([0], [0], marker='^', color='gray', label='50$^{\circ}$C', markersize=12, ls='None', markeredgecolor='k')
-]
-plt.legend(handles=handles + temp_elements, bbox_to_anchor=(1.05, 1), loc='upper left', frameon=True)
-
-plt.grid(True, linestyle='--', alpha=0.3, linewidth=1.5)
-plt.tight_layout()
-
-os.makedirs('figures/roughness', exist_ok=True)
-plt.savefig('figures/roughness/structure_transition_plot.png', bbox_inches='tight')
-plt.show()
\ No newline at end of file
+    summary.columns = ['Strain', 'Temp', 'RMS_mean', 'RMS_std', 'Wavelength_mean', 'Wavelength_std']
+    return summary
+
+def analyze_oct_directory(root_path='data/OCT', output_dir='results', jobs=1, pack_path=None,
+                          chunksize=None, method='fft', welch_options=None, store=None):
+    if pack_path is None:
+        with span('manifest'):
+            entries = build_manifest(root_path, kind='oct')
+        sources = [entry.path for entry in entries]
+    else:
+        # Read scans zero-copy from a pack built by oct_store.py instead of the CSVs
+        keys = open_pack(pack_path).keys()
+        entries = [describe_file(Path(root_path) / f"{key}.csv", 'oct') for key in keys]
+        sources = [(pack_path, key) for key in keys]
+
+    if method == 'batch':
+        # Extract surfaces per file, then one vectorised detrend/rfft over all colonies
+        profiles = parallel_map(partial(load_oct_profile, chunksize=chunksize), sources, jobs=jobs)
+        entries = [entry for entry, profile in zip(entries, profiles) if profile is not None]
+        profiles = [profile for profile in profiles if profile is not None]
+        with span('fft'):
+            spectra = batch_spectra(profiles)
+        metrics = [{'RMS': rms, 'Wavelength': wavelength}
+                   for rms, wavelength in zip(spectra['rms'], spectra['wavelength'])]
+
+        labels = pd.DataFrame({'Strain': [e.isolate for e in entries],
+                               'Temp': [e.temperature for e in entries]})
+        os.makedirs(output_dir, exist_ok=True)
+        with span('aggregate'):
+            groups = group_spectra(spectra, labels)
+        groups.to_csv(os.path.join(output_dir, 'oct_psd_groups.csv'), index=False)
+    elif method == 'welch':
+        analyze = partial(analyze_oct_file_welch, chunksize=chunksize, **(welch_options or {}))
+        metrics = [None if m is None else
+                   {'RMS': m['rms'], 'Wavelength': m['wavelength'], 'Prominence': m['prominence']}
+                   for m in parallel_map(analyze, sources, jobs=jobs)]
+    else:
+        metrics = [None if rms is None else {'RMS': rms, 'Wavelength': wavelength}
+                   for rms, wavelength in parallel_map(partial(analyze_oct_file, chunksize=chunksize),
+                                                       sources, jobs=jobs)]
+
+    results, colonies = [], []
+    for entry, values in zip(entries, metrics):
+        if values is not None:
+            results.append({'Strain': entry.isolate, 'Temp': entry.temperature, 'Week': entry.week,
+                            **values})
+            colonies.append(entry)
+
+    res_df = pd.DataFrame(results)
+    with span('aggregate'):
+        summary = summarise_roughness(res_df)
+
+    if store is not None:
+        store.record_colonies(root_path, colonies, res_df, method=method)
+    os.makedirs(output_dir, exist_ok=True)
+    res_df.to_csv(os.path.join(output_dir, 'oct_fft_all.csv'), index=False)
+    summary.to_csv(os.path.join(output_dir, 'oct_fft_summary.csv'), index=False)
+    return res_df, summary
+
+def plot_structure_transition(summary, output_dir='figures/roughness'):
+    from matplotlib.lines import Line2D
+    plt = pyplot(ROUGHNESS_STYLE)
+
+    # --- Transition Plot ---
+    plt.figure(figsize=(14, 10))
+    color_cycle = plt.rcParams['axes.prop_cycle'].by_key()['color']
+
+    for i, strain in enumerate(sorted(summary['Strain'].unique())):
+        subset = summary[summary['Strain'] == strain].sort_values('Temp')
+        color = color_cycle[i % len(color_cycle)]
+        if len(subset) >= 2:
+            x = subset['Wavelength_mean'].values
+            y = subset['RMS_mean'].values
+            x_err = subset['Wavelength_std'].values
+            y_err = subset['RMS_std'].values
+            
+            # 30C: Circle (o), 50C: Triangle (^)
+            plt.scatter(x[0], y[0], marker='o', s=250, color=color, edgecolors='black', zorder=5, label=strain)
+            plt.scatter(x[1], y[1], marker='^', s=300, color=color, edgecolors='black', zorder=5)
+            plt.errorbar(x[0], y[0], xerr=x_err[0], yerr=y_err[0],
+                         fmt='none', color=color, capsize=5, linewidth=1.5, zorder=4)
+            plt.errorbar(x[1], y[1], xerr=x_err[1], yerr=y_err[1],
+                         fmt='none', color=color, capsize=5, linewidth=1.5, zorder=4)
+
+    plt.xlabel(r'Wavelength $\lambda$ [$\mu$m]', labelpad=15)
+    plt.ylabel(r'RMS Roughness [$\mu$m]', labelpad=15)
+
+    handles, labels = plt.gca().get_legend_handles_labels()
+    temp_elements = [
+        Line2D([0], [0], marker='o', color='gray', label='30$^{\circ}$C', markersize=12, ls='None', markeredgecolor='k'),
+        Line2D([0], [0], marker='^', color='gray', label='50$^{\circ}$C', markersize=12, ls='None', markeredgecolor='k')
+    ]
+    plt.legend(handles=handles + temp_elements, bbox_to_anchor=(1.05, 1), loc='upper left', frameon=True)
+
+    plt.grid(True, linestyle='--', alpha=0.3, linewidth=1.5)
+    plt.tight_layout()
+
+    os.makedirs(output_dir, exist_ok=True)
+    with span('savefig', 'structure_transition_plot.png'):
+        plt.savefig(os.path.join(output_dir, 'structure_transition_plot.png'), bbox_inches='tight')
+
+if __name__ == "__main__":
+    from results_store import add_store_arguments, open_store
+    parser = argparse.ArgumentParser(description="OCT surface roughness and FFT wavelength analysis")
+    add_jobs_argument(parser)
+    add_profile_arguments(parser)
+    parser.add_argument('--pack', help="read scans from an OCT pack built by oct_store.py")
+    parser.add_argument('--chunksize', type=int,
+                        help="stream each CSV in chunks of this many pixels (bounded memory)")
+    parser.add_argument('--method', choices=['fft', 'batch', 'welch'], default='fft',
+                        help="per-file FFT, one batched spectrum over all colonies "
+                             "(also writes per-group averaged spectra), or per-file Welch PSD")
+    parser.add_argument('--nperseg', type=int,
+                        help="Welch segment length [samples] (default: half of each profile, "
+                             "at least 256); caps the longest resolvable wavelength")
+    parser.add_argument('--noverlap', type=int, help="Welch segment overlap (default: nperseg // 2)")
+    parser.add_argument('--window', default='hann', help="Welch window")
+    parser.add_argument('--peak', choices=['parabolic', 'gaussian'], default='parabolic',
+                        help="sub-bin peak interpolation for the Welch wavelength")
+    add_store_arguments(parser)
+    args = parser.parse_args()
+
+    start_profiling(args)
+    welch_options = {'nperseg': args.nperseg, 'noverlap': args.noverlap,
+                     'window': args.window, 'peak': args.peak}
+    _, summary = analyze_oct_directory('data/OCT', 'results', jobs=args.jobs, pack_path=args.pack,
+                                       chunksize=args.chunksize, method=args.method,
+                                       welch_options=welch_options, store=open_store(args))
+    plot_structure_transition(summary)
+    finish_profiling(args)
+    pyplot().show()
@@ -0,0 +1,67 @@
+import numpy as np
+from collections import namedtuple
+
+# Segment kinds, in the order of their integer codes in a segment table
+SEGMENT_KINDS = ['frequency', 'amplitude', 'hold']
+
+# Steps smaller than these (in decades) count as "unchanged": the instrument
+# reports the set frequency exactly but the achieved strain jitters by ~0.5 %
+FREQUENCY_TOLERANCE = 0.01
+STRAIN_TOLERANCE = 0.01
+# Fewer repeated points than this (e.g. the duplicated last amplitude point)
+# stay part of the surrounding sweep
+MIN_HOLD_POINTS = 3
+
+# Rows start:stop of one export
+Segment = namedtuple('Segment', ['kind', 'start', 'stop'])
+
+def _log_steps(values):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.abs(np.diff(np.log10(np.where(values > 0, values, np.nan))))
+
+def segment_table(freq, strain):
+    """Split one export into labelled segments in a single vectorised pass.
+
+    Rows whose frequency differs from both neighbours form a frequency
+    sweep. A run of rows at one frequency is an amplitude sweep, except
+    for stretches of at least MIN_HOLD_POINTS rows where the strain does
+    not change either, which are holds. Without a frequency column the
+    whole export is taken to be at one frequency. Returns an int64
+    (segments x 3) table of (kind code, start, stop) row offsets.
+    """
+    strain = np.asarray(strain, dtype=float)
+    n = len(strain)
+    if n == 0:
+        return np.empty((0, 3), dtype=np.int64)
+    freq = np.ones(n) if freq is None else np.asarray(freq, dtype=float)
+
+    # 1. Runs of constant frequency; single-row runs belong to a frequency sweep
+    freq_step = _log_steps(freq) > FREQUENCY_TOLERANCE
+    run = np.r_[0, np.cumsum(freq_step)]
+    in_freq_sweep = np.bincount(run)[run] == 1
+
+    # 2. Holds: rows linked by steps that change neither frequency nor strain
+    still = ~freq_step & ~(_log_steps(strain) > STRAIN_TOLERANCE)
+    stretch = np.r_[0, np.cumsum(~still)]
+    in_hold = np.bincount(stretch)[stretch] >= MIN_HOLD_POINTS
+
+    code = np.where(in_freq_sweep, 0, np.where(in_hold, 2, 1))
+
+    # 3. A new segment starts where the kind changes, or where a fixed-frequency
+    # segment moves to another frequency
+    boundary = (code[1:] != code[:-1]) | ((code[1:] != 0) & freq_step)
+    starts = np.flatnonzero(np.r_[True, boundary])
+    stops = np.r_[starts[1:], n]
+    return np.stack([code[starts], starts, stops], axis=1).astype(np.int64)
+
+def segments_from_table(table):
+    """Segment tuples from a segment table"""
+    return [Segment(SEGMENT_KINDS[code], int(start), int(stop)) for code, start, stop in table]
+
+def segment_slice(table, kind):
+    """Row slice of the first segment of one kind, or None if the export has none"""
+    code = SEGMENT_KINDS.index(kind)
+    for row_code, start, stop in table:
+        if row_code == code:
+            return slice(int(start), int(stop))
+    return None
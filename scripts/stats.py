@@ -1,98 +1,343 @@
+import argparse
+import itertools
+import json
+from math import comb
 import pandas as pd
 import numpy as np
-from scipy import stats
 import os
 
 # --- 1. Configuration ---
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 RESULTS_PATH = os.path.normpath(os.path.join(SCRIPT_DIR, "..", "results", "all_params.csv"))
 OUTPUT_REPORT = os.path.normpath(os.path.join(SCRIPT_DIR, "..", "results", "statistical_report.txt"))
+OUTPUT_TABLE = os.path.normpath(os.path.join(SCRIPT_DIR, "..", "results", "statistical_tests.csv"))
 
-# Create results folder if it doesn't exist
-os.makedirs(os.path.dirname(OUTPUT_REPORT), exist_ok=True)
+# Log-transforming G0_prime and WSO is physically more sound due to order-of-magnitude differences
+METRICS = ['G0_prime', 'tan_delta0', 'gamma_y', 'WSO']
+LOG_METRICS = ['G0_prime', 'WSO']
+CONTROL_ID = '3610'
 
-# --- 2. Load Data ---
-if not os.path.exists(RESULTS_PATH):
-    print(f"Error: {RESULTS_PATH} not found. Ensure raw data is processed first.")
-    exit()
+CORRECTION_NAMES = {
+    'bonferroni': "Bonferroni",
+    'holm': "Holm",
+    'bh': "Benjamini-Hochberg (FDR)",
+    'none': "No",
+}
 
-df = pd.read_csv(RESULTS_PATH)
-# Log-transforming G0_prime and WSO is physically more sound due to order-of-magnitude differences
-metrics = ['G0_prime', 'tan_delta0', 'gamma_y', 'WSO']
-isolates = df['Isolate'].unique()
+# Which tests form one correction family: 'part-b' corrects Part B per metric
+# only (Part A uncorrected), 'part' corrects each part per metric, 'report'
+# treats every test in the report as one family.
+SCOPES = ('part-b', 'part', 'report')
 
-with open(OUTPUT_REPORT, "w") as f:
-    f.write("============================================================\n")
-    f.write("STATISTICAL ANALYSIS REPORT: BIOFILM THERMAL STABILITY\n")
-    f.write("Note: Welch's T-test used for unequal variances.\n")
-    f.write("Note: Log10 transformation applied to G0_prime and WSO for analysis.\n")
-    f.write("============================================================\n\n")
+TEST_NOTES = {
+    'welch': "Note: Welch's T-test used for unequal variances.\n",
+    'permutation': "Note: Permutation test (Welch t statistic, exact or Monte-Carlo) used.\n",
+}
 
-    # --- PART A: Internal Thermal Sensitivity (30C vs 50C per Isolate) ---
-    f.write("PART A: Internal Thermal Sensitivity (30C vs 50C per Isolate)\n")
-    f.write("-" * 75 + "\n")
-    f.write(f"{'Isolate':<10} | {'Metric':<12} | {'T-Stat':<10} | {'P-Value':<10} | {'Sig.'}\n")
-    f.write("-" * 75 + "\n")
+def collect_comparisons(df):
+    """Every comparison of the report, in report order.
+
+    Part A compares 30C with 50C per isolate, Part B each isolate with the
+    3610 control at 50C. Returns a list of dicts with the labels, the raw
+    values of both groups ('a', 'b') and 'Planned', the number of
+    comparisons planned for that part and metric (one per isolate, whether
+    or not it had enough replicates to be tested).
+    """
+    # Isolate IDs are compared as strings whether df was read from CSV or passed in memory
+    df = df.assign(Isolate=df['Isolate'].astype(str))
+    isolates = df['Isolate'].unique()
+    comparisons = []
 
     for isolate in isolates:
         iso_df = df[df['Isolate'] == isolate]
-        for metric in metrics:
+        for metric in METRICS:
             group30 = iso_df[iso_df['Temperature'] == '30C'][metric].dropna()
             group50 = iso_df[iso_df['Temperature'] == '50C'][metric].dropna()
-            
             if len(group30) >= 2 and len(group50) >= 2:
-                # Apply log transformation for G0 and WSO to handle exponential scale
-                if metric in ['G0_prime', 'WSO']:
-                    t_stat, p_val = stats.ttest_ind(np.log10(group30), np.log10(group50), equal_var=False)
-                else:
-                    t_stat, p_val = stats.ttest_ind(group30, group50, equal_var=False)
-                
-                sig = "***" if p_val < 0.001 else "**" if p_val < 0.01 else "*" if p_val < 0.05 else "ns"
-                f.write(f"{str(isolate):<10} | {metric:<12} | {t_stat:>10.4f} | {p_val:>10.4e} | {sig}\n")
-        f.write("-" * 75 + "\n")
-
-    f.write("\n\n")
-
-    # --- PART B: Comparative Analysis at 50C (Isolates vs 3610) ---
-    f.write("PART B: Comparative Analysis at 50C (Reference: 3610)\n")
-    f.write("-" * 85 + "\n")
-    f.write("Bonferroni Correction applied. Sig. if Adj. P-Value < 0.05\n")
-    f.write(f"{'Comparison':<20} | {'Metric':<12} | {'Diff (%)':<10} | {'Adj. P-Val':<12} | {'Status'}\n")
-    f.write("-" * 85 + "\n")
+                comparisons.append({'Part': 'A', 'Isolate': isolate, 'Reference': '50C', 'Metric': metric,
+                                    'a': group30.values, 'b': group50.values, 'Planned': len(isolates)})
 
     df_50 = df[df['Temperature'] == '50C']
-    control_id = 3610 
-    
-    if control_id in df_50['Isolate'].values:
-        control_data = df_50[df_50['Isolate'] == control_id]
-        other_isolates = [i for i in isolates if i != control_id]
-        num_comparisons = len(other_isolates)
-
-        for metric in metrics:
+    if CONTROL_ID in df_50['Isolate'].values:
+        control_data = df_50[df_50['Isolate'] == CONTROL_ID]
+        other_isolates = [i for i in isolates if i != CONTROL_ID]
+        for metric in METRICS:
             ctrl_vals = control_data[metric].dropna()
-            
             for target in other_isolates:
                 target_vals = df_50[df_50['Isolate'] == target][metric].dropna()
-                
                 if len(target_vals) >= 2 and len(ctrl_vals) >= 2:
-                    # T-test with Welch's correction
-                    if metric in ['G0_prime', 'WSO']:
-                        _, p_val = stats.ttest_ind(np.log10(target_vals), np.log10(ctrl_vals), equal_var=False)
-                    else:
-                        _, p_val = stats.ttest_ind(target_vals, ctrl_vals, equal_var=False)
-                    
-                    # Bonferroni-Adjusted P-Value (Capped at 1.0)
-                    p_adj = min(p_val * num_comparisons, 1.0)
-                    
-                    diff_pct = ((target_vals.mean() - ctrl_vals.mean()) / ctrl_vals.mean()) * 100
-                    
-                    # Define Status based on adjusted p-value
-                    if p_adj < 0.05:
-                        status = "SUPERIOR" if diff_pct > 0 else "INFERIOR"
-                    else:
-                        status = "SIMILAR"
-                    
-                    f.write(f"{str(target) + ' vs 3610':<20} | {metric:<12} | {diff_pct:>9.1f}% | {p_adj:>10.4e} | {status}\n")
-            f.write("-" * 85 + "\n")
-
-print(f"Refined statistical report generated at: {OUTPUT_REPORT}")
\ No newline at end of file
+                    comparisons.append({'Part': 'B', 'Isolate': target, 'Reference': CONTROL_ID, 'Metric': metric,
+                                        'a': target_vals.values, 'b': ctrl_vals.values,
+                                        'Planned': len(other_isolates)})
+    return comparisons
+
+def _transformed(comparison):
+    if comparison['Metric'] in LOG_METRICS:
+        return np.log10(comparison['a']), np.log10(comparison['b'])
+    return comparison['a'], comparison['b']
+
+def welch_tests(comparisons):
+    """Welch t statistic and p-value per comparison (scipy, one pair at a time)"""
+    from scipy.stats import ttest_ind
+    results = [ttest_ind(*_transformed(c), equal_var=False) for c in comparisons]
+    return np.array([r[0] for r in results]), np.array([r[1] for r in results])
+
+def _assignments(n_a, n_b, max_exact, n_resamples, rng):
+    """Index matrices (P x n_a, P x n_b) of group relabellings; row 0 is the observed one"""
+    n = n_a + n_b
+    if comb(n, n_a) <= max_exact:
+        # Exact: every split, in lexicographic order (the first is the observed labelling)
+        idx_a = np.array(list(itertools.combinations(range(n), n_a)))
+        mask = np.zeros((len(idx_a), n), dtype=bool)
+        mask[np.arange(len(idx_a))[:, None], idx_a] = True
+    else:
+        mask = np.argsort(rng.random((n_resamples + 1, n)), axis=1) < n_a
+        mask[0] = np.arange(n) < n_a
+    order = np.argsort(~mask, axis=1, kind='stable')
+    return order[:, :n_a], order[:, n_a:]
+
+def _welch_t(a, b):
+    n_a, n_b = a.shape[-1], b.shape[-1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (a.mean(axis=-1) - b.mean(axis=-1)) / np.sqrt(
+            a.var(axis=-1, ddof=1) / n_a + b.var(axis=-1, ddof=1) / n_b)
+
+def permutation_tests(comparisons, max_exact=100000, n_resamples=9999, seed=0):
+    """Two-sided permutation test of the Welch t statistic for all comparisons.
+
+    Comparisons with the same group sizes share one relabelling matrix and
+    are evaluated together: pooled values (C x n) are gathered into every
+    relabelling (C x P x n_a / n_b) and t is computed for all of them at
+    once. Splits are enumerated exactly when there are at most max_exact of
+    them, otherwise n_resamples random relabellings are drawn (p-value
+    includes the observed one). Returns (observed t, p-value) arrays.
+    """
+    rng = np.random.default_rng(seed)
+    t_obs = np.full(len(comparisons), np.nan)
+    p_val = np.full(len(comparisons), np.nan)
+
+    shapes = {}
+    for i, c in enumerate(comparisons):
+        shapes.setdefault((len(c['a']), len(c['b'])), []).append(i)
+
+    for (n_a, n_b), rows in sorted(shapes.items()):
+        pooled = np.array([np.concatenate(_transformed(comparisons[i])) for i in rows])
+        idx_a, idx_b = _assignments(n_a, n_b, max_exact, n_resamples, rng)
+        t = _welch_t(pooled[:, idx_a], pooled[:, idx_b])
+        observed = t[:, :1]
+        # Ties up to round-off count as "at least as extreme". The observed
+        # labelling is row 0 in both modes, so this is the exact p-value or
+        # the Monte-Carlo (1 + hits) / (B + 1)
+        extreme = np.abs(t) >= np.abs(observed) * (1 - 1e-12)
+        p = extreme.mean(axis=1)
+        t_obs[rows] = observed[:, 0]
+        p_val[rows] = np.where(np.isnan(observed[:, 0]), np.nan, p)
+    return t_obs, p_val
+
+def adjust_p_values(p_val, family, family_size, method='bonferroni'):
+    """Multiple-comparison adjusted p-values for many families at once.
+
+    family labels each test, family_size is the number of hypotheses m in
+    its family (>= the tests present; missing ones count as p = 1). Holm
+    and Benjamini-Hochberg are computed by sorting all tests by (family,
+    p) once and taking grouped running max / min. NaN p-values stay NaN
+    and are not ranked.
+    """
+    p_val = np.asarray(p_val, dtype=float)
+    adjusted = np.full(p_val.shape, np.nan)
+    valid = ~np.isnan(p_val)
+    if method == 'none' or not valid.any():
+        return np.where(valid, p_val, np.nan)
+
+    tests = pd.DataFrame({'p': p_val, 'family': np.asarray(family), 'm': np.asarray(family_size)})[valid]
+    tests = tests.sort_values(['family', 'p'], kind='stable')
+    rank = tests.groupby('family', sort=False).cumcount().to_numpy() + 1
+    p, m = tests['p'].to_numpy(), tests['m'].to_numpy(dtype=float)
+
+    if method == 'bonferroni':
+        adj = p * m
+    elif method == 'holm':
+        adj = pd.Series((m - rank + 1) * p, index=tests.index).groupby(tests['family'].values).cummax().to_numpy()
+    elif method == 'bh':
+        scaled = pd.Series(p * m / rank, index=tests.index)[::-1]
+        adj = scaled.groupby(tests['family'].values[::-1]).cummin()[::-1].to_numpy()
+    else:
+        raise ValueError(f"unknown correction '{method}'")
+
+    adjusted[tests.index.to_numpy()] = np.minimum(adj, 1.0)
+    return adjusted
+
+def correction_families(table, scope='part-b'):
+    """(family label, family size, corrected?) per row of the test table"""
+    if scope == 'part-b':
+        family = table['Part'] + '/' + table['Metric']
+        return family, table['Planned'], (table['Part'] == 'B').to_numpy()
+    if scope == 'part':
+        family = table['Part'] + '/' + table['Metric']
+        return family, table['Planned'], np.ones(len(table), dtype=bool)
+    if scope == 'report':
+        m = int(table['P_value'].notna().sum())
+        return pd.Series('all', index=table.index), np.full(len(table), m), np.ones(len(table), dtype=bool)
+    raise ValueError(f"unknown correction scope '{scope}'")
+
+def run_tests(df, test='welch', correction='bonferroni', scope='part-b', **options):
+    """Table of every comparison with its statistic, raw and adjusted p-values and verdict"""
+    comparisons = collect_comparisons(df)
+    if test == 'welch':
+        t_stat, p_val = welch_tests(comparisons)
+    elif test == 'permutation':
+        t_stat, p_val = permutation_tests(comparisons, **options)
+    else:
+        raise ValueError(f"unknown test '{test}'")
+
+    table = pd.DataFrame({
+        'Part': [c['Part'] for c in comparisons],
+        'Isolate': [c['Isolate'] for c in comparisons],
+        'Reference': [c['Reference'] for c in comparisons],
+        'Metric': [c['Metric'] for c in comparisons],
+        'Test': test,
+        'N_a': [len(c['a']) for c in comparisons],
+        'N_b': [len(c['b']) for c in comparisons],
+        'Planned': [c['Planned'] for c in comparisons],
+        'Statistic': np.asarray(t_stat, dtype=float),
+        'P_value': np.asarray(p_val, dtype=float),
+        'Diff_pct': [((c['a'].mean() - c['b'].mean()) / c['b'].mean()) * 100 for c in comparisons],
+    })
+
+    family, family_size, corrected = correction_families(table, scope)
+    adjusted = adjust_p_values(table['P_value'], family, family_size, method=correction)
+    table['Correction'] = np.where(corrected, correction, 'none')
+    table['Family'] = np.where(corrected, family, '')
+    table['Family_size'] = np.where(corrected, family_size, 1)
+    table['Adj_P_value'] = np.where(corrected, adjusted, table['P_value'])
+
+    # Part A: significance stars; Part B: status relative to the control
+    adj, diff = table['Adj_P_value'].to_numpy(), table['Diff_pct'].to_numpy()
+    stars = np.select([adj < 0.001, adj < 0.01, adj < 0.05], ["***", "**", "*"], "ns")
+    status = np.where(adj < 0.05, np.where(diff > 0, "SUPERIOR", "INFERIOR"), "SIMILAR")
+    table['Verdict'] = np.where(table['Part'] == 'A', stars, status)
+    return table[['Part', 'Isolate', 'Reference', 'Metric', 'Test', 'N_a', 'N_b', 'Statistic', 'P_value',
+                  'Correction', 'Family', 'Family_size', 'Adj_P_value', 'Diff_pct', 'Verdict']]
+
+def _section(rows, key, groups, format_row, width):
+    """Report lines of one part: the rows of each group followed by a rule"""
+    lines = rows.apply(format_row, axis=1) if len(rows) else pd.Series(dtype=object)
+    by_group = lines.groupby(rows[key].values).agg(list) if len(rows) else {}
+    out = []
+    for group in groups:
+        out.extend(by_group.get(group, []))
+        out.append("-" * width)
+    return out
+
+def render_report(table, isolates, control_present, test='welch', correction='bonferroni', scope='part-b'):
+    """Text of statistical_report.txt, rendered from the test table"""
+    name = CORRECTION_NAMES[correction]
+    part_a_corrected = scope != 'part-b' and correction != 'none'
+    lines = [
+        "============================================================",
+        "STATISTICAL ANALYSIS REPORT: BIOFILM THERMAL STABILITY",
+        TEST_NOTES[test].rstrip("\n"),
+        "Note: Log10 transformation applied to G0_prime and WSO for analysis.",
+    ]
+    if part_a_corrected:
+        family = "all tests of the report" if scope == 'report' else "each part and metric"
+        lines.append(f"Note: {name} correction applied across {family}.")
+    lines += ["============================================================", ""]
+
+    # --- PART A: Internal Thermal Sensitivity (30C vs 50C per Isolate) ---
+    p_header, p_col = ('Adj. P-Val', 'Adj_P_value') if part_a_corrected else ('P-Value', 'P_value')
+    lines += [
+        "PART A: Internal Thermal Sensitivity (30C vs 50C per Isolate)",
+        "-" * 75,
+        f"{'Isolate':<10} | {'Metric':<12} | {'T-Stat':<10} | {p_header:<10} | {'Sig.'}",
+        "-" * 75,
+    ]
+    lines += _section(
+        table[table['Part'] == 'A'], 'Isolate', isolates,
+        lambda row: f"{str(row.Isolate):<10} | {row.Metric:<12} | {row.Statistic:>10.4f} | {row[p_col]:>10.4e} | {row.Verdict}",
+        75)
+    lines += ["", ""]
+
+    # --- PART B: Comparative Analysis at 50C (Isolates vs 3610) ---
+    if correction == 'none':
+        rule = "No correction applied. Sig. if P-Value < 0.05"
+    else:
+        rule = f"{name} Correction applied. Sig. if Adj. P-Value < 0.05"
+    lines += [
+        "PART B: Comparative Analysis at 50C (Reference: 3610)",
+        "-" * 85,
+        rule,
+        f"{'Comparison':<20} | {'Metric':<12} | {'Diff (%)':<10} | {'Adj. P-Val':<12} | {'Status'}",
+        "-" * 85,
+    ]
+    if control_present:
+        lines += _section(
+            table[table['Part'] == 'B'], 'Metric', METRICS,
+            lambda row: f"{str(row.Isolate) + ' vs ' + row.Reference:<20} | {row.Metric:<12} | {row.Diff_pct:>9.1f}% | {row.Adj_P_value:>10.4e} | {row.Verdict}",
+            85)
+    return "\n".join(lines) + "\n"
+
+def write_statistical_report(df, output_report=OUTPUT_REPORT, test='welch', correction='bonferroni',
+                             scope='part-b', output_table=None, output_json=None, **options):
+    """Write the significance report for a per-replicate parameter table (all_params.csv).
+
+    test is 'welch' (scipy t-tests) or 'permutation' (see permutation_tests,
+    which takes the extra options). correction ('bonferroni', 'holm', 'bh'
+    or 'none') is applied within the families given by scope (see SCOPES);
+    the defaults reproduce the original report. The same results are
+    optionally written as a CSV and/or JSON table. Returns that table.
+    """
+    # Create results folder if it doesn't exist
+    os.makedirs(os.path.dirname(output_report), exist_ok=True)
+    table = run_tests(df, test=test, correction=correction, scope=scope, **options)
+    isolates = df['Isolate'].astype(str).unique()
+    control_present = CONTROL_ID in df.loc[df['Temperature'] == '50C', 'Isolate'].astype(str).values
+
+    with open(output_report, "w") as f:
+        f.write(render_report(table, isolates, control_present, test, correction, scope))
+
+    print(f"Refined statistical report generated at: {output_report}")
+
+    if output_table:
+        table.to_csv(output_table, index=False)
+    if output_json:
+        with open(output_json, "w") as f:
+            json.dump(table.to_dict(orient='records'), f, indent=2)
+    return table
+
+if __name__ == "__main__":
+    from results_store import ResultsStore, add_filter_arguments, selected_filters
+    parser = argparse.ArgumentParser(description="Significance report for the extracted parameters")
+    parser.add_argument('--test', choices=['welch', 'permutation'], default='welch')
+    parser.add_argument('--max-exact', type=int, default=100000,
+                        help="enumerate every relabelling when there are at most this many")
+    parser.add_argument('--resamples', type=int, default=9999,
+                        help="random relabellings when exact enumeration is too large")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--correction', choices=list(CORRECTION_NAMES), default='bonferroni')
+    parser.add_argument('--scope', choices=SCOPES, default='part-b',
+                        help="family of tests each correction is applied within")
+    parser.add_argument('--table', default=OUTPUT_TABLE, help="machine-readable CSV of every comparison")
+    parser.add_argument('--json', default=None, help="also write the comparisons as JSON")
+    parser.add_argument('--db', help="read the parameters from this results store instead of the CSV")
+    add_filter_arguments(parser)
+    args = parser.parse_args()
+
+    # --- 2. Load Data ---
+    filters = selected_filters(args)
+    if args.db:
+        df = ResultsStore(args.db).parameters(**filters)
+    elif filters:
+        print("Error: --isolate/--temperature/--week/--replicate need --db.")
+        exit()
+    elif not os.path.exists(RESULTS_PATH):
+        print(f"Error: {RESULTS_PATH} not found. Ensure raw data is processed first.")
+        exit()
+    else:
+        df = pd.read_csv(RESULTS_PATH)
+
+    options = {}
+    if args.test == 'permutation':
+        options = {'max_exact': args.max_exact, 'n_resamples': args.resamples, 'seed': args.seed}
+    write_statistical_report(df, test=args.test, correction=args.correction,
+                             scope=args.scope, output_table=args.table, output_json=args.json, **options)
@@ -1,27 +1,22 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
+from style import ROUGHNESS_STYLE, pyplot
 
-plt.rcParams.update({
-    'mathtext.fontset': 'cm',
-    'font.size': 28,
-    'axes.titlesize': 32,
-    'axes.labelsize': 28,
-    'xtick.labelsize': 24,
-    'ytick.labelsize': 24,
-    'legend.fontsize': 20,
-    'axes.unicode_minus': False,
-    'axes.linewidth': 2,
-    'figure.dpi': 150
-})
+def plot_roughness_correlations(rms_df=None, rheo_df=None, store=None, **filters):
+    if store is not None:
+        # Group means joined inside the results store (filters: isolate, temperature, week, ...)
+        master_df = store.correlation_table(**filters)
+    else:
+        if rms_df is None:
+            rms_df = pd.read_csv('results/oct_fft_summary.csv')
+        if rheo_df is None:
+            rheo_df = pd.read_csv('results/all_params_avg.csv')
+        rheo_df = rheo_df.rename(columns={'Isolate': 'Strain', 'Temperature': 'Temp'})
+        # Merge on string IDs so CSV-loaded and in-memory tables line up
+        rms_df = rms_df.assign(Strain=rms_df['Strain'].astype(str))
+        rheo_df = rheo_df.assign(Strain=rheo_df['Strain'].astype(str))
 
-def plot_roughness_correlations():
-    rms_df = pd.read_csv('results/oct_fft_summary.csv')
-    rheo_df = pd.read_csv('results/all_params_avg.csv')
-    rheo_df = rheo_df.rename(columns={'Isolate': 'Strain', 'Temperature': 'Temp'})
-
-    master_df = pd.merge(rms_df, rheo_df, on=['Strain', 'Temp'])
+        master_df = pd.merge(rms_df, rheo_df, on=['Strain', 'Temp'])
     
     unique_strains = sorted(master_df['Strain'].unique())
     marker_list = ['o', 's', 'P', 'D', 'v', '^', 'X']
@@ -30,6 +25,9 @@ def plot_roughness_correlations():
     output_dir = Path("figures/roughness")
     output_dir.mkdir(parents=True, exist_ok=True)
 
+    import seaborn as sns
+    plt = pyplot(ROUGHNESS_STYLE)
+
     def create_plot(x_col, xlabel, filename, is_log=False):
         plt.figure(figsize=(14, 10))
         
@@ -59,4 +57,11 @@ def plot_roughness_correlations():
     print("✅ Correlation plots with unique isolate markers saved.")
 
 if __name__ == "__main__":
-    plot_roughness_correlations()
\ No newline at end of file
+    import argparse
+    from results_store import ResultsStore, add_filter_arguments, selected_filters
+    parser = argparse.ArgumentParser(description="G'0 / yield strain vs RMS roughness correlation plots")
+    parser.add_argument('--db', help="read group means from this results store instead of the CSVs")
+    add_filter_arguments(parser)
+    args = parser.parse_args()
+    store = ResultsStore(args.db) if args.db else None
+    plot_roughness_correlations(store=store, **selected_filters(args))
\ No newline at end of file
@@ -0,0 +1,39 @@
+# Shared figure styles. Nothing here imports matplotlib until a figure is drawn,
+# so numeric stages that import a plotting module stay free of it.
+
+# Strain-sweep master curves (raw_master.py, normalisation.py)
+CURVE_STYLE = {
+    'mathtext.fontset': 'cm',
+    'font.size': 28,
+    'axes.titlesize': 32,
+    'axes.labelsize': 28,
+    'xtick.labelsize': 24,
+    'ytick.labelsize': 24,
+    'legend.fontsize': 20,
+    'axes.unicode_minus': False,
+    'axes.linewidth': 2
+}
+
+# OCT roughness plots (roughness_fft_analysis.py, stiffness_roughness_correlation.py)
+ROUGHNESS_STYLE = dict(CURVE_STYLE, **{'figure.dpi': 150})
+
+# Parameter bar charts (parameter_bar.py), applied only while a bar chart is being drawn
+PARAMETER_STYLE = {
+    'mathtext.fontset': 'cm',
+    'font.size': 24,
+    'axes.titlesize': 28,
+    'axes.labelsize': 24,
+    'xtick.labelsize': 20,
+    'ytick.labelsize': 20,
+    'legend.fontsize': 18,
+    'legend.title_fontsize': 20,
+    'axes.linewidth': 2,
+    'figure.dpi': 150
+}
+
+def pyplot(style=None):
+    """Import pyplot on first use and apply a style to the global rcParams"""
+    import matplotlib.pyplot as plt
+    if style:
+        plt.rcParams.update(style)
+    return plt
@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+from instrument import instrumented
+
+# Horizontal shifts searched (decades of strain either side of the reference) and
+# the candidate spacing; the best candidate is refined by golden-section search
+MAX_SHIFT = 2.0
+SHIFT_STEP = 0.02
+REFINE_ITERATIONS = 40
+# A shift must overlap at least this fraction of a curve's own (channel x grid)
+# points, and never fewer than MIN_OVERLAP; otherwise sliding a curve that does
+# not superimpose off the end of the reference always wins
+MIN_OVERLAP_FRACTION = 2 / 3
+MIN_OVERLAP = 20
+# Memory budget of one (curves x candidates x channels x grid) block, in elements
+CHUNK_ELEMENTS = 1 << 22
+
+# Default reference: the lab strain at the standard growth temperature
+REFERENCE = ('3610', '30C')
+
+SHIFT_COLUMNS = ['Strain_shift', 'Modulus_shift', 'Log_strain_shift', 'Log_strain_shift_err',
+                 'Log_modulus_shift', 'Log_modulus_shift_err', 'Overlap', 'RMS_residual', 'Reference']
+
+GOLDEN = (np.sqrt(5) - 1) / 2
+
+def crossover_strain(log_strain, log_g1, log_g2):
+    """Log strain of the first G' > G'' -> G' < G'' crossing, linearly interpolated.
+
+    Falls back to the grid point where |log G' - log G''| is smallest when
+    the curve never crosses.
+    """
+    diff = log_g1 - log_g2
+    cross = np.flatnonzero((diff[:-1] > 0) & (diff[1:] < 0))
+    if len(cross) == 0:
+        return log_strain[np.nanargmin(np.abs(diff))]
+    i = cross[0]
+    return log_strain[i] + diff[i] * (log_strain[i + 1] - log_strain[i]) / (diff[i] - diff[i + 1])
+
+class _Reference:
+    """Piecewise-linear reference curve (2 channels) and its slope.
+
+    Points are weighted by how far inside the reference's strain range
+    they fall, fading to zero over one grid step at either end, so the
+    misfit changes continuously as points slide in and out of the overlap.
+    """
+
+    def __init__(self, log_x, log_curve):
+        keep = np.isfinite(log_curve).all(axis=0)
+        self.x = log_x[keep]
+        self.y = log_curve[:, keep]
+        self.slope = np.gradient(self.y, self.x, axis=1)
+        self.step = np.median(np.diff(self.x))
+
+    def at(self, xq, values=None):
+        """(values at xq, overlap weight at xq), values stacked on axis -2"""
+        values = self.y if values is None else values
+        weight = np.clip(np.minimum(xq - self.x[0], self.x[-1] - xq) / self.step + 1, 0, 1)
+        return np.stack([np.interp(xq, self.x, v) for v in values], axis=-2), weight
+
+def _profile(log_curves, shifted, weight, required):
+    """Weighted mean-square misfit with the vertical shift solved in closed form.
+
+    log_curves (..., 2, grid) minus a shifted reference of the same shape,
+    with overlap weights (..., grid); returns (mean square, vertical shift,
+    overlap) over the last two axes. The misfit is infinite where the
+    overlap is below `required`.
+    """
+    diff = log_curves - shifted
+    weight = np.where(np.isfinite(diff), weight[..., None, :], 0.0)
+    diff = np.where(weight > 0, diff, 0.0)
+    overlap = weight.sum(axis=(-2, -1))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vertical = (weight * diff).sum(axis=(-2, -1)) / overlap
+        mean_square = (weight * (diff - vertical[..., None, None]) ** 2).sum(axis=(-2, -1)) / overlap
+    mean_square = np.where(overlap >= required, mean_square, np.inf)
+    return mean_square, vertical, overlap
+
+def _at_shifts(reference, log_x, shifts, values=None):
+    """Reference and overlap weight at log_x - h, one h per curve: (curves x 2 x grid), (curves x grid)"""
+    xq = log_x[None, :] - shifts[:, None]
+    shifted, weight = reference.at(xq.ravel(), values)
+    return shifted.reshape(2, len(shifts), len(log_x)).transpose(1, 0, 2), weight.reshape(xq.shape)
+
+@instrumented('superposition')
+def solve_shift_factors(log_x, log_curves, reference_index):
+    """Shifts superimposing every curve onto one reference in log-log space.
+
+    log_curves is (curves x 2 x grid) log10 G'/G'' on the log10 strain grid
+    log_x, NaN outside each curve's range. Curve i is modelled as the
+    reference moved right by h_i and up by v_i. For every horizontal
+    candidate in +-MAX_SHIFT the optimal v and the mean-square misfit
+    follow in closed form, so all curves and candidates are scored in a
+    few array passes; the best candidate is then refined by a golden-section
+    search run on all curves at once. Standard errors come from the
+    Gauss-Newton covariance of (h, v) at the optimum.
+    Returns a dict of per-curve arrays.
+    """
+    reference = _Reference(log_x, log_curves[reference_index])
+    n_curves = len(log_curves)
+    candidates = np.arange(-MAX_SHIFT, MAX_SHIFT + SHIFT_STEP / 2, SHIFT_STEP)
+    points = np.isfinite(log_curves).sum(axis=(1, 2))
+    required = np.maximum(np.ceil(MIN_OVERLAP_FRACTION * points), MIN_OVERLAP)
+
+    # 1. Coarse search: reference shifted by every candidate, scored against every curve
+    shifted, weight = _at_shifts(reference, log_x, candidates)
+    chunk = max(1, CHUNK_ELEMENTS // shifted.size)
+    best = np.empty(n_curves, dtype=np.intp)
+    for start in range(0, n_curves, chunk):
+        block = log_curves[start:start + chunk, None]
+        mean_square, _, _ = _profile(block, shifted[None], weight[None], required[start:start + chunk, None])
+        best[start:start + chunk] = np.argmin(mean_square, axis=1)
+
+    # 2. Golden-section refinement within one candidate step of the best
+    lo, hi = candidates[best] - SHIFT_STEP, candidates[best] + SHIFT_STEP
+    objective = lambda h: _profile(log_curves, *_at_shifts(reference, log_x, h), required)[0]
+    a = hi - GOLDEN * (hi - lo)
+    b = lo + GOLDEN * (hi - lo)
+    fa, fb = objective(a), objective(b)
+    for _ in range(REFINE_ITERATIONS):
+        left = fa <= fb
+        hi = np.where(left, b, hi)
+        lo = np.where(left, lo, a)
+        b_new = np.where(left, a, lo + GOLDEN * (hi - lo))
+        a_new = np.where(left, hi - GOLDEN * (hi - lo), b)
+        a, b = a_new, b_new
+        moved = objective(np.where(left, a, b))
+        fa, fb = np.where(left, moved, fb), np.where(left, fa, moved)
+    horizontal = (lo + hi) / 2
+    mean_square, vertical, overlap = _profile(log_curves, *_at_shifts(reference, log_x, horizontal), required)
+    horizontal[reference_index], vertical[reference_index] = 0.0, 0.0
+
+    # 3. Standard errors: residual variance times (J^T W J)^-1, J = [reference slope, -1]
+    slope, weight = _at_shifts(reference, log_x, horizontal, reference.slope)
+    weight = np.where(np.isfinite(log_curves), weight[:, None, :], 0.0)
+    s1, s2 = (weight * slope).sum(axis=(1, 2)), (weight * slope ** 2).sum(axis=(1, 2))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = mean_square * overlap / (overlap - 2)
+        det = overlap * s2 - s1 ** 2
+        horizontal_err = np.sqrt(variance * overlap / det)
+        vertical_err = np.sqrt(variance * s2 / det)
+
+    failed = ~np.isfinite(mean_square)
+    for values in (horizontal, vertical, horizontal_err, vertical_err):
+        values[failed] = np.nan
+    horizontal_err[reference_index] = vertical_err[reference_index] = 0.0
+    return {'horizontal': horizontal, 'vertical': vertical, 'horizontal_err': horizontal_err,
+            'vertical_err': vertical_err, 'overlap': overlap, 'rms': np.sqrt(mean_square)}
+
+def shift_factor_table(averages, grid, reference=REFERENCE):
+    """Strain and modulus shift factors of every (isolate, temperature) curve.
+
+    averages maps (isolate, temperature) to averaged (G', G'') on grid. The
+    reference curve is normalised as in the crossover method (strain by its
+    interpolated G' = G'' crossing, moduli by the mean G' of the first ten
+    grid points); every other curve inherits that normalisation through its
+    fitted shift, so Strain_shift and Modulus_shift play the roles of
+    gamma_f and G'0. Errors (in decades) are those of the shift relative
+    to the reference.
+    """
+    keys = sorted(averages)
+    if reference not in averages:
+        raise KeyError(f"reference curve {reference[0]} at {reference[1]} not found")
+    log_x = np.log10(grid)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_curves = np.log10(np.array([np.stack(averages[key]) for key in keys]))
+    log_curves[~np.isfinite(log_curves)] = np.nan
+    ref = keys.index(reference)
+
+    fit = solve_shift_factors(log_x, log_curves, ref)
+    g1_ref, g2_ref = averages[reference]
+    log_gamma_f = crossover_strain(log_x, log_curves[ref, 0], log_curves[ref, 1])
+    log_g0 = np.log10(np.nanmean(g1_ref[:10]))
+
+    df = pd.DataFrame(keys, columns=['Isolate', 'Temperature'])
+    df['Log_strain_shift'] = fit['horizontal'] + log_gamma_f
+    df['Log_modulus_shift'] = fit['vertical'] + log_g0
+    df['Strain_shift'] = 10 ** df['Log_strain_shift']
+    df['Modulus_shift'] = 10 ** df['Log_modulus_shift']
+    df['Log_strain_shift_err'] = fit['horizontal_err']
+    df['Log_modulus_shift_err'] = fit['vertical_err']
+    df['Overlap'] = fit['overlap']
+    df['RMS_residual'] = fit['rms']
+    df['Reference'] = [key == reference for key in keys]
+    return df[['Isolate', 'Temperature'] + SHIFT_COLUMNS]
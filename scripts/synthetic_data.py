@@ -0,0 +1,251 @@
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from scipy.optimize import brentq
+from parallel import add_jobs_argument, parallel_map
+
+# Exact header of the rheometer exports (written with a UTF-8 BOM)
+RHEOLOGY_HEADER = ("Gap(mm),Normal force(N),Shear modulus (elastic component)(Pa),"
+                   "Shear modulus (viscous component)(Pa),Complex shear strain(%),Frequency(Hz)")
+OCT_HEADER = "X,Y,Value"
+
+# Instrument protocol: frequency sweep 10 -> 0.1 Hz at ~0.1 % strain, then an
+# amplitude sweep at 1 Hz from 0.01 % to ~200 % (10 points per decade)
+SWEEP_FREQUENCIES = 10 ** np.arange(1.0, -1.05, -0.1)
+SWEEP_STRAINS = 10 ** np.arange(-2.0, 2.35, 0.1)
+FREQUENCY_SWEEP_STRAIN = 0.1
+
+TRUTH_COLUMNS = ['Kind', 'Source', 'Isolate', 'Temperature', 'G0_prime', 'tan_delta0', 'gamma_f',
+                 'gamma_y', 'WSO', 'Freq_exponent_G1', 'Freq_exponent_G2', 'RMS', 'Wavelength']
+
+def format_instrument(values, digits):
+    """Format numbers like the rheometer export: `digits` significant figures,
+    with a 3-digit exponent (9.356E-003, 1.020E+004) outside [0.01, 10000)"""
+    out = []
+    for value in np.asarray(values, dtype=float):
+        rounded = abs(float(f"{value:.{digits}g}"))
+        if value != 0 and not 0.01 <= rounded < 10000:
+            mantissa, exponent = f"{value:.{digits - 1}E}".split('E')
+            out.append(f"{mantissa}E{int(exponent):+04d}")
+        else:
+            out.append(f"{value:#.{digits}g}".rstrip('.'))
+    return out
+
+def amplitude_sweep_moduli(strain, g0, tan_delta0, gamma_y, gamma_f, wso=0.0, sharpness=2.0, tan_delta_max=5.0):
+    """Noise-free G'(γ), G''(γ) of the amplitude-sweep model.
+
+    G' = G0 / (1 + (γ/γ_k)^p) with γ_k chosen so G' = 0.95 G0 exactly at
+    gamma_y. log tan δ rises logistically (in log strain) from tan_delta0
+    to tan_delta_max, passing 1 at gamma_f, so without an overshoot the
+    crossover is exactly gamma_f. A Gaussian bump (in log strain) of
+    height `wso` Pa centred between gamma_y and gamma_f adds the weak
+    strain overshoot to G''.
+    """
+    strain = np.asarray(strain, dtype=float)
+    gamma_k = gamma_y * 19.0 ** (1.0 / sharpness)
+    g1 = g0 / (1.0 + (strain / gamma_k) ** sharpness)
+
+    log_lo, log_hi = np.log(tan_delta0), np.log(tan_delta_max)
+    at_crossover = -log_lo / (log_hi - log_lo)
+    gamma_h = gamma_f * (1.0 / at_crossover - 1.0) ** 0.5
+    tan_delta = np.exp(log_lo + (log_hi - log_lo) / (1.0 + (gamma_h / strain) ** 2))
+
+    centre = np.sqrt(gamma_y * gamma_f)
+    bump = wso * np.exp(-0.5 * (np.log10(strain / centre) / 0.3) ** 2)
+    return g1, g1 * tan_delta + bump
+
+def frequency_sweep_moduli(frequency, g0, tan_delta0, exponent_g1, exponent_g2):
+    """Power-law G'(f), G''(f) of the small-strain frequency sweep (1 Hz reference)"""
+    frequency = np.asarray(frequency, dtype=float)
+    return g0 * frequency ** exponent_g1, g0 * tan_delta0 * frequency ** exponent_g2
+
+def rheology_truth(params, max_strain=SWEEP_STRAINS[-1]):
+    """Ground-truth parameters of the noise-free model.
+
+    γ_f (the first G' = G'' root) and WSO (the G'' peak above 0.5 %
+    strain minus G''0, floored at zero) follow the definitions in
+    parameter.py. G'0, tan δ0 and γ_y are the model parameters themselves
+    (small-strain limits and the exact 95 % point), not what
+    extract_metrics_batch can recover from the sampled sweep: it averages
+    G' over the 10^-0.8 - 1 % plateau, where the model has already begun
+    to soften, and reports γ_y as the first grid point below 95 % of that
+    plateau. The extracted γ_y therefore overshoots the truth by up to one
+    grid step (+26 % at 10 points per decade) and G'0 is low by < 0.5 %.
+    """
+    model = lambda s: amplitude_sweep_moduli(s, params['g0'], params['tan_delta0'], params['gamma_y'],
+                                             params['gamma_f'], params['wso'], params['sharpness'])
+    dense = np.logspace(-3, np.log10(max_strain), 20001)
+    g1, g2 = model(dense)
+    diff = g1 - g2
+    cross = np.flatnonzero((diff[:-1] > 0) & (diff[1:] <= 0))
+    if cross.size:
+        log_f = brentq(lambda u: np.subtract(*model(10 ** u)), np.log10(dense[cross[0]]),
+                       np.log10(dense[cross[0] + 1]))
+        gamma_f = 10 ** log_f
+    else:
+        gamma_f = np.nan
+    gpp0 = params['g0'] * params['tan_delta0']
+    wso = max(g2[dense > 0.5].max() - gpp0, 0.0)
+    return {'G0_prime': params['g0'], 'tan_delta0': params['tan_delta0'], 'gamma_f': gamma_f,
+            'gamma_y': params['gamma_y'], 'WSO': wso,
+            'Freq_exponent_G1': params['exponent_g1'], 'Freq_exponent_G2': params['exponent_g2']}
+
+def rheology_table(params, rng, noise=0.01, gap=0.4023):
+    """Rows of one synthetic export (frequency sweep then amplitude sweep) as strings"""
+    n_freq, n_amp = len(SWEEP_FREQUENCIES), len(SWEEP_STRAINS)
+    freq_strain = FREQUENCY_SWEEP_STRAIN * (1 + 0.005 * rng.standard_normal(n_freq))
+    amp_strain = SWEEP_STRAINS * (1 + 0.002 * rng.standard_normal(n_amp))
+    # The instrument repeats the last amplitude point
+    amp_strain = np.append(amp_strain, amp_strain[-1] * (1 + 0.002 * rng.standard_normal()))
+
+    f_g1, f_g2 = frequency_sweep_moduli(SWEEP_FREQUENCIES, params['g0'], params['tan_delta0'],
+                                        params['exponent_g1'], params['exponent_g2'])
+    a_g1, a_g2 = amplitude_sweep_moduli(amp_strain, params['g0'], params['tan_delta0'], params['gamma_y'],
+                                        params['gamma_f'], params['wso'], params['sharpness'])
+    g1 = np.concatenate([f_g1, a_g1]) * np.exp(noise * rng.standard_normal(n_freq + n_amp + 1))
+    g2 = np.concatenate([f_g2, a_g2]) * np.exp(noise * rng.standard_normal(n_freq + n_amp + 1))
+    strain = np.concatenate([freq_strain, amp_strain])
+    frequency = np.concatenate([SWEEP_FREQUENCIES, np.ones(n_amp + 1)])
+    normal_force = np.abs(0.005 + 0.002 * rng.standard_normal(len(strain)))
+
+    columns = [format_instrument(np.full(len(strain), gap), 4), format_instrument(normal_force, 4),
+               format_instrument(g1, 4), format_instrument(g2, 4), format_instrument(strain, 6),
+               format_instrument(frequency, 4)]
+    return [",".join(row) for row in zip(*columns)]
+
+def oct_profile(rng, width=3104, amplitude=8.0, wavelength=400.0, roughness=2.0,
+                correlation_length=15.0, base=40.0, tilt=0.0):
+    """Float surface height per X column: tilted baseline + sinusoid + correlated noise"""
+    x = np.arange(width)
+    noise = rng.standard_normal(width)
+    if correlation_length > 1:
+        kernel = np.exp(-0.5 * (np.arange(-3 * correlation_length, 3 * correlation_length + 1)
+                                / correlation_length) ** 2)
+        noise = np.convolve(noise, kernel, mode='same')
+        noise /= noise.std()
+    phase = rng.uniform(0, 2 * np.pi)
+    return base + tilt * (x - width / 2) + amplitude * np.sin(2 * np.pi * x / wavelength + phase) \
+        + roughness * noise
+
+def oct_truth(profile, wavelength):
+    """RMS of the linearly detrended float profile and the generating wavelength (pixels)"""
+    x = np.arange(len(profile))
+    residual = profile - np.polyval(np.polyfit(x, profile, 1), x)
+    return {'RMS': residual.std(), 'Wavelength': wavelength}
+
+def oct_lines(profile, thickness=2):
+    """X,Y,Value rows of a segmented surface, `thickness` lit pixels per column,
+    in the row-major (Y, then X) order of the exports"""
+    top = np.maximum(np.rint(profile).astype(np.int64), 0)
+    x = np.tile(np.arange(len(profile)), thickness)
+    y = (top[None, :] + np.arange(thickness)[:, None]).ravel()
+    order = np.lexsort((x, y))
+    return [f"{xi},{yi},255" for xi, yi in zip(x[order], y[order])]
+
+def draw_group_parameters(rng):
+    """Random 'isolate' parameters spanning the ranges seen in the real data"""
+    gamma_y = 10 ** rng.uniform(np.log10(3), np.log10(30))
+    return {
+        'g0': 10 ** rng.uniform(1, 4.3),
+        'tan_delta0': rng.uniform(0.05, 0.8),
+        'gamma_y': gamma_y,
+        'gamma_f': gamma_y * 10 ** rng.uniform(0.3, 1.0),
+        'wso_ratio': rng.uniform(0.0, 0.5),
+        'sharpness': rng.uniform(1.5, 3.0),
+        'exponent_g1': rng.uniform(0.02, 0.2),
+        'exponent_g2': rng.uniform(0.05, 0.3),
+        'amplitude': rng.uniform(2, 15),
+        'wavelength': rng.uniform(150, 800),
+        'roughness': rng.uniform(0.5, 4),
+    }
+
+def replicate_parameters(group, rng, spread=0.1):
+    """One replicate: the group parameters with lognormal replicate scatter"""
+    jitter = lambda: np.exp(spread * rng.standard_normal())
+    params = dict(group)
+    params['g0'] = group['g0'] * jitter()
+    params['gamma_y'] = group['gamma_y'] * jitter()
+    params['gamma_f'] = max(group['gamma_f'] * jitter(), params['gamma_y'] * 1.5)
+    params['wso'] = group['wso_ratio'] * params['g0'] * params['tan_delta0']
+    return params
+
+def _write_file(task):
+    kind, path, params, seed, options = task
+    rng = np.random.default_rng(seed)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if kind == 'rheology':
+        lines = [RHEOLOGY_HEADER] + rheology_table(params, rng, noise=options['noise'])
+        path.write_text("\n".join(lines) + "\n", encoding='utf-8-sig')
+        return rheology_truth(params)
+    profile = oct_profile(rng, width=options['oct_width'], amplitude=params['amplitude'],
+                          wavelength=params['wavelength'], roughness=params['roughness'])
+    path.write_text("\n".join([OCT_HEADER] + oct_lines(profile, options['oct_thickness'])) + "\n")
+    return oct_truth(profile, params['wavelength'])
+
+def generate_dataset(output_root, n_isolates=8, temperatures=('30C', '50C'), replicates=3,
+                     weeks=('week3', 'week4', 'week5'), oct_plates=3, oct_replicates=3,
+                     oct_width=3104, oct_thickness=2, noise=0.01, seed=0, jobs=1):
+    """Write a synthetic data/<temp>/<week>/ and data/OCT/<temp>/<week>/ tree.
+
+    Isolate '3610' (the control) plus n_isolates - 1 synthetic IDs each get
+    random parameters per temperature; replicates scatter around them and
+    are spread round-robin over `weeks`. Every file has its own seed
+    derived from `seed`, so the tree is identical for any `jobs`. Returns
+    the ground truth per file (also written to ground_truth.csv).
+    """
+    output_root = Path(output_root)
+    rng = np.random.default_rng(seed)
+    isolates = ['3610'] + [str(9001 + i) for i in range(n_isolates - 1)]
+    options = {'noise': noise, 'oct_width': oct_width, 'oct_thickness': oct_thickness}
+
+    tasks, labels = [], []
+    for isolate in isolates:
+        for temp in temperatures:
+            group = draw_group_parameters(rng)
+            for r in range(replicates):
+                week = weeks[r % len(weeks)]
+                path = output_root / temp / week / f"{isolate}_{temp}_{r + 1}.csv"
+                tasks.append(('rheology', path, replicate_parameters(group, rng)))
+                labels.append(('rheology', isolate, temp))
+            for p in range(oct_plates):
+                for r in range(oct_replicates):
+                    week = weeks[(p * oct_replicates + r) % len(weeks)]
+                    path = output_root / "OCT" / temp / week / f"{isolate}_plate{p + 1}_{r + 1}.csv"
+                    tasks.append(('oct', path, group))
+                    labels.append(('oct', isolate, temp))
+
+    seeds = np.random.SeedSequence(seed).spawn(len(tasks))
+    tasks = [(kind, path, params, s, options) for (kind, path, params), s in zip(tasks, seeds)]
+    truths = parallel_map(_write_file, tasks, jobs=jobs)
+
+    rows = []
+    for (kind, isolate, temp), task, truth in zip(labels, tasks, truths):
+        rows.append({'Kind': kind, 'Source': task[1].relative_to(output_root).as_posix(),
+                     'Isolate': isolate, 'Temperature': temp, **truth})
+    truth_df = pd.DataFrame(rows, columns=TRUTH_COLUMNS)
+    truth_df.to_csv(output_root / "ground_truth.csv", index=False)
+
+    n_rheo = sum(kind == 'rheology' for kind, _, _ in labels)
+    print(f"✅ Wrote {n_rheo} rheology sweeps and {len(labels) - n_rheo} OCT scans under {output_root}")
+    return truth_df
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic rheology/OCT data tree with known ground truth")
+    parser.add_argument('output', help="root of the generated tree (use instead of data/)")
+    parser.add_argument('--isolates', type=int, default=8)
+    parser.add_argument('--temperatures', nargs='+', default=['30C', '50C'])
+    parser.add_argument('--replicates', type=int, default=3, help="rheology sweeps per isolate and temperature")
+    parser.add_argument('--weeks', nargs='+', default=['week3', 'week4', 'week5'])
+    parser.add_argument('--oct-plates', type=int, default=3)
+    parser.add_argument('--oct-replicates', type=int, default=3)
+    parser.add_argument('--oct-width', type=int, default=3104, help="X columns per OCT scan")
+    parser.add_argument('--oct-thickness', type=int, default=2, help="lit pixels per column (scan size)")
+    parser.add_argument('--noise', type=float, default=0.01, help="relative noise on G' and G''")
+    parser.add_argument('--seed', type=int, default=0)
+    add_jobs_argument(parser)
+    args = parser.parse_args()
+    generate_dataset(args.output, n_isolates=args.isolates, temperatures=args.temperatures,
+                     replicates=args.replicates, weeks=args.weeks, oct_plates=args.oct_plates,
+                     oct_replicates=args.oct_replicates, oct_width=args.oct_width,
+                     oct_thickness=args.oct_thickness, noise=args.noise, seed=args.seed, jobs=args.jobs)